@@ -7,9 +7,42 @@ import os
 import sys
 import subprocess
 import signal
+import socket
 import time
 from pathlib import Path
 
+BACKEND_PORT = 8000
+
+
+def wait_ready(port, proc, timeout=15.0):
+    """Wait until something accepts connections on localhost:port.
+
+    Returns False if ``proc`` exits or ``timeout`` expires first.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return True
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+    return False
+
+
+def _signal_group(proc, signum):
+    """Send ``signum`` to the process group led by ``proc`` (e.g. uvicorn and its workers)."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signum)
+        else:
+            proc.send_signal(signum)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
 def main():
     # Get the project root directory
     project_root = Path(__file__).parent
@@ -17,8 +50,9 @@ def main():
     frontend_dir = project_root / "src" / "cai" / "web" / "frontend"
     
     # Add src to Python path
-    src_dir = project_root / "src"
-    sys.path.insert(0, str(src_dir))
+    src_dir = str(project_root / "src")
+    if src_dir not in sys.path:
+        sys.path.insert(0, src_dir)
     
     # Set default environment variables
     env = os.environ.copy()
@@ -26,10 +60,17 @@ def main():
         env["CAI_MODEL"] = "openrouter/z-ai/glm-4.5-air:free"
     if not env.get("CAI_AGENT_TYPE"):
         env["CAI_AGENT_TYPE"] = "one_tool_agent"
-    if not env.get("PYTHONPATH"):
-        env["PYTHONPATH"] = str(src_dir)
-    else:
-        env["PYTHONPATH"] = f"{src_dir}:{env['PYTHONPATH']}"
+    python_path = env.get("PYTHONPATH")
+    if not python_path:
+        env["PYTHONPATH"] = src_dir
+    elif src_dir not in python_path.split(os.pathsep):
+        env["PYTHONPATH"] = os.pathsep.join((src_dir, python_path))
+    # Keep child logs flowing when the launcher's output is redirected
+    env["PYTHONUNBUFFERED"] = "1"
+    
+    # The React dev server is opt-in (CAI_WEB_FRONTEND=1); without it the
+    # launcher execs straight into the backend.
+    start_frontend = env.get("CAI_WEB_FRONTEND") == "1"
     
     processes = []
     
@@ -37,15 +78,16 @@ def main():
         print("\n🛑 Shutting down CAI Web Interface...")
         for proc in processes:
             if proc.poll() is None:
-                proc.terminate()
-        
-        # Wait a bit for graceful shutdown
-        time.sleep(2)
+                _signal_group(proc, signal.SIGTERM)
         
-        # Force kill if needed
+        # Give each process up to 2 seconds to shut down gracefully,
+        # force kill if needed
+        deadline = time.monotonic() + 2
         for proc in processes:
-            if proc.poll() is None:
-                proc.kill()
+            try:
+                proc.wait(timeout=max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                _signal_group(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
         
         sys.exit(0)
     
@@ -61,55 +103,99 @@ def main():
         # Start backend
         print("🔧 Starting backend server...")
         backend_cmd = [
-            sys.executable, "-m", "uvicorn", "cai.web.backend.main:app",
-            "--host", "0.0.0.0", "--port", "8000", "--reload"
+            sys.executable, "-u", "-m", "uvicorn", "cai.web.backend.main:app",
+            "--host", "0.0.0.0", "--port", str(BACKEND_PORT)
         ]
+        if env.get("CAI_DEV") == "1":
+            # Auto-reload is a development convenience; it cannot be
+            # combined with multiple workers.
+            backend_cmd.append("--reload")
+        else:
+            # Sessions and tasks live in process memory, so running more
+            # than one worker is opt-in via CAI_WORKERS.
+            workers = env.get("CAI_WORKERS")
+            if workers and workers != "1":
+                backend_cmd.extend(["--workers", workers])
+
+        if not start_frontend:
+            # Nothing else to supervise: replace the launcher with uvicorn so
+            # signals are delivered to the server directly.
+            print("✅ CAI Web Interface is starting...")
+            print(f"🔗 Backend API: http://localhost:{BACKEND_PORT}")
+            print(f"📋 API Docs: http://localhost:{BACKEND_PORT}/docs")
+            print("🛑 Press Ctrl+C to stop")
+            sys.stdout.flush()
+            os.chdir(project_root)
+            os.execvpe(sys.executable, backend_cmd, env)
+
         backend_proc = subprocess.Popen(
             backend_cmd,
             cwd=str(project_root),
             env=env,
             stdout=sys.stdout,
             stderr=sys.stderr,
-            text=True
+            text=True,
+            bufsize=1,
+            start_new_session=True
         )
         processes.append(backend_proc)
         
-        # Wait a moment for backend to start
-        time.sleep(3)
+        # Wait for the backend to accept connections
+        if not wait_ready(BACKEND_PORT, backend_proc):
+            if backend_proc.poll() is not None:
+                print("❌ Backend process exited during startup")
+            else:
+                print(f"❌ Backend did not start listening on port {BACKEND_PORT}")
+            signal_handler(signal.SIGTERM, None)
         
-        # # Start frontend  
-        # print("💻 Starting frontend server...")
-        # frontend_cmd = [
-        #     "npm", "start"
-        # ]
-        # frontend_env = env.copy()
-        # frontend_env.update({
-        #     "PORT": "3000",
-        #     "GENERATE_SOURCEMAP": "false",
-        #     "REACT_APP_API_URL": "http://localhost:8000",
-        #     "REACT_APP_WS_URL": "ws://localhost:8000"
-        # })
+        # Start frontend
+        print("💻 Starting frontend server...")
+        frontend_cmd = [
+            "npm", "start"
+        ]
+        frontend_env = env.copy()
+        frontend_env.update({
+            "PORT": "3000",
+            "GENERATE_SOURCEMAP": "false",
+            "REACT_APP_API_URL": f"http://localhost:{BACKEND_PORT}",
+            "REACT_APP_WS_URL": f"ws://localhost:{BACKEND_PORT}"
+        })
         
-        # frontend_proc = subprocess.Popen(
-        #     frontend_cmd,
-        #     cwd=str(frontend_dir),
-        #     env=frontend_env,
-        #     stdout=subprocess.PIPE,
-        #     stderr=subprocess.STDOUT,
-        #     text=True
-        # )
-        # processes.append(frontend_proc)
+        # Inherit the launcher's output: nothing would drain a pipe here
+        frontend_proc = subprocess.Popen(
+            frontend_cmd,
+            cwd=str(frontend_dir),
+            env=frontend_env,
+            stdout=sys.stdout,
+            stderr=sys.stderr,
+            text=True,
+            start_new_session=True
+        )
+        processes.append(frontend_proc)
         
         print("✅ CAI Web Interface is starting...")
         print("🌐 Frontend: http://localhost:3000")
-        print("🔗 Backend API: http://localhost:8000")
-        print("📋 API Docs: http://localhost:8000/docs")
+        print(f"🔗 Backend API: http://localhost:{BACKEND_PORT}")
+        print(f"📋 API Docs: http://localhost:{BACKEND_PORT}/docs")
         print("🛑 Press Ctrl+C to stop")
         
         # Monitor processes
+        if hasattr(signal, "SIGCHLD"):
+            # Block until a signal arrives instead of waking up every second.
+            # The SIGCHLD handler itself is a no-op: the interpreter writes the
+            # signal number to the wakeup socket, which unblocks recv().
+            wakeup_r, wakeup_w = socket.socketpair()
+            wakeup_w.setblocking(False)
+            signal.set_wakeup_fd(wakeup_w.fileno())
+            signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+            def wait_for_event():
+                wakeup_r.recv(64)
+        else:
+            def wait_for_event():
+                time.sleep(1)
+
         while True:
-            time.sleep(1)
-            
             # Check if any process died
             for i, proc in enumerate(processes):
                 if proc.poll() is not None:
@@ -120,6 +206,8 @@ def main():
                     
                     # Kill all processes and exit
                     signal_handler(signal.SIGTERM, None)
+
+            wait_for_event()
                     
     except KeyboardInterrupt:
         signal_handler(signal.SIGINT, None)
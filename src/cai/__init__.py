@@ -1,6 +1,10 @@
 # CAI Framework
 
 # --- begin shim for optional dependencies ---
+import functools
+
+
+@functools.cache
 def is_pentestperf_available() -> bool:
     """
     Check if pentestperf is available as an optional dependency.
@@ -11,6 +15,7 @@ def is_pentestperf_available() -> bool:
     except Exception:
         return False
 
+@functools.cache
 def is_caiextensions_platform_available() -> bool:
     """
     Check if caiextensions platform is available as an optional dependency.
@@ -21,6 +26,7 @@ def is_caiextensions_platform_available() -> bool:
     except Exception:
         return False
 
+@functools.cache
 def is_caiextensions_memory_available() -> bool:
     """
     Check if caiextensions memory is available as an optional dependency.
@@ -8,6 +8,7 @@ streams safely (optionally), and mirrors key ENV behavior from the CLI.
 
 Requirements (install in the same venv where CAI is available):
   pip install -U discord.py python-dotenv
+  pip install -U uvloop              # optional, faster event loop (not on Windows)
 
 Env vars (examples):
   DISCORD_TOKEN=...                 # required
@@ -16,6 +17,8 @@ Env vars (examples):
   CAI_MODEL=alias0                  # default model
   CAI_MAX_TURNS=inf                 # e.g. "50" to cap turns per channel
   CAI_STREAM=false                  # set true to enable streamed edits
+  CAI_MAX_SESSIONS=512              # max channel sessions kept in memory (LRU)
+  CAI_DISCORD_STATE_FILE=...        # optional, defaults to ~/.cai/discord_bot_state.json
 
 Run:
   python discord_cai_bot.py
@@ -24,40 +27,51 @@ from __future__ import annotations
 
 import os
 import asyncio
+import hashlib
 import logging
 import warnings
 import json
+import re
+import sys
+from collections import OrderedDict
 from io import BytesIO
+from itertools import islice
+from pathlib import Path
 from typing import Dict, Optional, List, Any, Tuple
+from weakref import WeakValueDictionary
 
 from dotenv import load_dotenv
 load_dotenv()
 
 # ---- Noise suppression (adapted from your CLI module) ----------------------
+_SUPPRESS_PATTERNS = (
+    "asynchronous generator", "asyncgen", "closedresourceerror",
+    "didn't stop after athrow", "didnt stop after athrow",
+    "generator didn't stop", "cancel scope",
+    "unhandled errors in a taskgroup", "error in post_writer",
+    "was never awaited", "connection error while setting up",
+    "error closing", "httpx_sse", "connection reset by peer",
+    "broken pipe", "connection aborted", "runtime warning",
+    "runtimewarning", "coroutine", "task was destroyed",
+    "event loop is closed", "unclosed client session",
+    "unclosed connector", "client_session:", "connector:",
+    "connections:",
+)
+_SUPPRESS_RE = re.compile("|".join(re.escape(p) for p in _SUPPRESS_PATTERNS), re.IGNORECASE)
+_SSE_RE = re.compile("sse", re.IGNORECASE)
+_SSE_EXTRA_RE = re.compile("cleanup|closing|shutdown|closed", re.IGNORECASE)
+_DOWNGRADE_RE = re.compile(
+    "mcp server session not found|successfully reconnected to mcp server", re.IGNORECASE
+)
+
 class ComprehensiveErrorFilter(logging.Filter):
     def filter(self, record: logging.LogRecord) -> bool:
-        msg = record.getMessage().lower()
-        suppress_patterns = [
-            "asynchronous generator", "asyncgen", "closedresourceerror",
-            "didn't stop after athrow", "didnt stop after athrow",
-            "generator didn't stop", "cancel scope",
-            "unhandled errors in a taskgroup", "error in post_writer",
-            "was never awaited", "connection error while setting up",
-            "error closing", "httpx_sse", "connection reset by peer",
-            "broken pipe", "connection aborted", "runtime warning",
-            "runtimewarning", "coroutine", "task was destroyed",
-            "event loop is closed", "unclosed client session",
-            "unclosed connector", "client_session:", "connector:",
-            "connections:",
-        ]
-        for pat in suppress_patterns:
-            if pat in msg:
-                return False
-        if "sse" in msg and any(w in msg for w in ["cleanup","closing","shutdown","closed"]):
+        msg = record.getMessage()
+        if _SUPPRESS_RE.search(msg):
             return False
-        if "error invoking mcp tool" in msg and "closedresourceerror" in msg:
+        if _SSE_RE.search(msg) and _SSE_EXTRA_RE.search(msg):
             return False
-        if "mcp server session not found" in msg or "successfully reconnected to mcp server" in msg:
+        if _DOWNGRADE_RE.search(msg):
             record.levelno = logging.DEBUG
             record.levelname = "DEBUG"
         return True
@@ -96,9 +110,14 @@ from cai.sdk.agents import Runner, set_tracing_disabled
 from cai.sdk.agents.items import ToolCallOutputItem
 from cai.util import fix_message_list, fix_litellm_transcription_annotations
 
-# Some models/agents use internal tracing; match CLI behavior
-set_tracing_disabled(True)
-fix_litellm_transcription_annotations()
+# Some models/agents use internal tracing; match CLI behavior. Guarded so that
+# importing this module under a second name (e.g. ``python -m``) or reloading it
+# doesn't re-apply the process-wide patches.
+_PATCH_KEY = "_cai_discord_bot_patched"
+if not getattr(sys, _PATCH_KEY, False):
+    set_tracing_disabled(True)
+    fix_litellm_transcription_annotations()
+    setattr(sys, _PATCH_KEY, True)
 
 # ---- Discord imports -------------------------------------------------------
 import discord
@@ -109,45 +128,76 @@ from discord import app_commands
 def update_agent_models_recursively(agent, new_model, visited: Optional[set] = None):
     if visited is None:
         visited = set()
-    if getattr(agent, "name", None) in visited:
+    if id(agent) in visited:
         return
-    visited.add(getattr(agent, "name", id(agent)))
-
-    if hasattr(agent, "model") and hasattr(agent.model, "model"):
-        agent.model.model = new_model
-        if hasattr(agent.model, "agent_name"):
-            agent.model.agent_name = getattr(agent, "name", "Agent")
-        if hasattr(agent.model, "_client"):
-            agent.model._client = None
-        if hasattr(agent.model, "_converter"):
-            conv = agent.model._converter
-            if hasattr(conv, "recent_tool_calls"):
-                conv.recent_tool_calls.clear()
-            if hasattr(conv, "tool_outputs"):
-                conv.tool_outputs.clear()
-
-    if hasattr(agent, "handoffs"):
-        for handoff_item in agent.handoffs:
+    visited.add(id(agent))
+
+    m = getattr(agent, "model", None)
+    try:
+        # Nothing to do (and client/converter state worth keeping) if the
+        # agent already uses this model with a live client; models whose
+        # client was never set up are still refreshed. Handoffs are still
+        # visited below
+        needs_update = m.model != new_model or getattr(m, "_client", None) is None
+    except AttributeError:
+        needs_update = False
+
+    if needs_update:
+        try:
+            m.model = new_model
+            m.agent_name = getattr(agent, "name", "Agent")
+            m._client = None
+            try:
+                conv = m._converter
+            except AttributeError:
+                pass
+            else:
+                try:
+                    conv.recent_tool_calls.clear()
+                except AttributeError:
+                    pass
+                try:
+                    conv.tool_outputs.clear()
+                except AttributeError:
+                    pass
+        except AttributeError:
+            pass
+
+    for handoff_item in getattr(agent, "handoffs", None) or ():
+        try:
             try:
-                if hasattr(handoff_item, "on_invoke_handoff") and getattr(handoff_item.on_invoke_handoff, "__closure__", None):
-                    for cell in handoff_item.on_invoke_handoff.__closure__:
-                        obj = getattr(cell, "cell_contents", None)
-                        if hasattr(obj, "model") and hasattr(obj, "name"):
-                            update_agent_models_recursively(obj, new_model, visited)
-                            break
-                elif hasattr(handoff_item, "model"):
+                closure = handoff_item.on_invoke_handoff.__closure__
+            except AttributeError:
+                closure = None
+            if not closure:
+                # Not a Handoff wrapper; may be an agent listed directly
+                if hasattr(handoff_item, "model"):
                     update_agent_models_recursively(handoff_item, new_model, visited)
-            except Exception:
                 continue
+            for cell in closure:
+                obj = getattr(cell, "cell_contents", None)
+                if hasattr(obj, "model") and hasattr(obj, "name"):
+                    update_agent_models_recursively(obj, new_model, visited)
+                    break
+        except Exception:
+            continue
 
 # ---- Per-channel agent session --------------------------------------------
+# Per-channel run locks. Held weakly so idle channels don't keep a lock alive;
+# a lock lives for as long as someone is holding or waiting on it.
+_CHANNEL_LOCKS: "WeakValueDictionary[int, asyncio.Lock]" = WeakValueDictionary()
+
 class AgentSession:
     def __init__(self, channel_id: int, agent_type: str, model: str):
         self.channel_id = channel_id
         self.agent_type = agent_type
         self.model = model
         self.turns = 0
-        self.lock = asyncio.Lock()
+        # Fixed-up copy of the agent's message history, maintained incrementally
+        self._fixed_history: List[dict] = []
+        self._mh_ref = None
+        self._mh_cursor = 0
+        self._mh_last = None  # mh[_mh_cursor - 1] when the cursor was last moved
         self.agent = get_agent_by_name(agent_type, agent_id=f"C{channel_id}")
         # Configure model flags for server context
         if hasattr(self.agent, "model"):
@@ -157,63 +207,189 @@ class AgentSession:
                 self.agent.model.suppress_final_output = False
         update_agent_models_recursively(self.agent, model)
 
+    @property
+    def lock(self) -> asyncio.Lock:
+        lock = _CHANNEL_LOCKS.get(self.channel_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            _CHANNEL_LOCKS[self.channel_id] = lock
+        return lock
+
     def reset(self):
         self.turns = 0
+        self._fixed_history = []
+        self._mh_ref = None
+        self._mh_cursor = 0
+        self._mh_last = None
         if hasattr(self.agent, "model") and hasattr(self.agent.model, "message_history"):
             self.agent.model.message_history.clear()
 
-    def build_history_context(self, user_text: str) -> List[dict] | str:
-        mh = getattr(getattr(self.agent, "model", object()), "message_history", [])
-        if not mh:
-            return user_text
-        history = []
-        for msg in mh:
-            role = msg.get("role")
-            if role in ("user", "system"):
-                history.append({"role": role, "content": msg.get("content") or ""})
+    @staticmethod
+    def _reshape_history(messages) -> List[dict]:
+        history: List[dict] = []
+        append = history.append
+        for msg in messages:
+            get = msg.get
+            role = get("role")
+            if role == "user" or role == "system":
+                append({"role": role, "content": get("content") or ""})
             elif role == "assistant":
-                tool_calls = msg.get("tool_calls")
+                tool_calls = get("tool_calls")
                 if tool_calls:
-                    history.append({"role": "assistant", "content": msg.get("content"), "tool_calls": tool_calls})
+                    append({"role": "assistant", "content": get("content"), "tool_calls": tool_calls})
                 else:
-                    history.append({"role": "assistant", "content": msg.get("content")})
+                    append({"role": "assistant", "content": get("content")})
             elif role == "tool":
-                history.append({"role": "tool", "tool_call_id": msg.get("tool_call_id"), "content": msg.get("content")})
+                append({"role": "tool", "tool_call_id": get("tool_call_id"), "content": get("content")})
+        return history
+
+    @staticmethod
+    def _fix_history(history: List[dict]) -> List[dict]:
         try:
-            history = fix_message_list(history)
+            return fix_message_list(history)
         except Exception:
-            pass
-        history.append({"role": "user", "content": user_text})
-        return history
+            return history
+
+    @staticmethod
+    def _answers_earlier_call(tail: List[dict]) -> bool:
+        """Whether `tail` holds a tool result for a call made before it"""
+        called = set()
+        for msg in tail:
+            for call in msg.get("tool_calls") or ():
+                called.add(call.get("id"))
+            if msg["role"] == "tool" and msg.get("tool_call_id") not in called:
+                return True
+        return False
+
+    def build_history_context(self, user_text: str) -> List[dict] | str:
+        mh = getattr(getattr(self.agent, "model", object()), "message_history", [])
+        if not mh:
+            return user_text
+        # Start over if the history was replaced or truncated behind our back
+        # (also when it was cleared in place and refilled past the cursor)
+        if (
+            mh is not self._mh_ref
+            or len(mh) < self._mh_cursor
+            or (self._mh_cursor and mh[self._mh_cursor - 1] is not self._mh_last)
+        ):
+            self._fixed_history = []
+            self._mh_ref = mh
+            self._mh_cursor = 0
+        # Only reshape/fix messages added since the previous turn
+        if len(mh) > self._mh_cursor:
+            tail = self._reshape_history(islice(mh, self._mh_cursor, None))
+            if self._answers_earlier_call(tail):
+                # A tool call and its result straddle the boundary. The fixed
+                # copy may already hold a placeholder result for that call, so
+                # fix the raw history as a whole instead
+                self._fixed_history = self._fix_history(self._reshape_history(mh))
+            else:
+                self._fixed_history.extend(self._fix_history(tail))
+            self._mh_cursor = len(mh)
+            self._mh_last = mh[-1]
+        return self._fixed_history + [{"role": "user", "content": user_text}]
+
+# ---- Cached ENV settings ---------------------------------------------------
+def _parse_max_turns(raw: str) -> float:
+    """CAI_MAX_TURNS as a float; a malformed value falls back to unlimited."""
+    if raw == "inf":
+        return float("inf")
+    try:
+        return float(raw)
+    except ValueError:
+        logging.warning(f"Invalid CAI_MAX_TURNS={raw!r}; using no turn limit")
+        return float("inf")
+
+class _EnvCache:
+    """
+    Parsed CAI_* settings used on every message.
+
+    Values are re-read from os.environ only after invalidate() is called
+    (e.g. by /config), so the hot path is a version check plus attribute loads.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._loaded_version = -1
+        self.refresh()
+
+    def invalidate(self) -> None:
+        self._version += 1
+
+    def refresh(self) -> "_EnvCache":
+        if self._loaded_version != self._version:
+            self.agent_type = os.getenv("CAI_AGENT_TYPE", "one_tool_agent")
+            self.model = os.getenv("CAI_MODEL", "alias0")
+            self.max_turns_raw = os.getenv("CAI_MAX_TURNS", "inf")
+            self.max_turns = _parse_max_turns(self.max_turns_raw)
+            self.stream = (os.getenv("CAI_STREAM", "false") or "false").lower() == "true"
+            self._loaded_version = self._version
+        return self
+
+ENV = _EnvCache()
+
+def _turn_limit_message(max_turns: float) -> str:
+    return f"Turn limit reached ({int(max_turns) if max_turns!=float('inf') else '∞'}). Use /config to increase CAI_MAX_TURNS."
+
+# Global sessions per channel, least recently used first
+SESSIONS: "OrderedDict[int, AgentSession]" = OrderedDict()
+MAX_SESSIONS = max(1, int(os.getenv("CAI_MAX_SESSIONS", "512")))
+
+def _dispose_session(sess: AgentSession) -> None:
+    # Leave sessions that are mid-run alone; they are dropped once the run ends
+    if sess.lock.locked():
+        return
+    sess.reset()
 
-# Global sessions per channel
-SESSIONS: Dict[int, AgentSession] = {}
+def store_session(channel_id: int, sess: AgentSession) -> None:
+    old = SESSIONS.pop(channel_id, None)
+    if old is not None and old is not sess:
+        _dispose_session(old)
+    while len(SESSIONS) >= MAX_SESSIONS:
+        _, evicted = SESSIONS.popitem(last=False)
+        _dispose_session(evicted)
+    SESSIONS[channel_id] = sess
 
 async def get_session(channel_id: int) -> AgentSession:
-    agent_type = os.getenv("CAI_AGENT_TYPE", "one_tool_agent")
-    model = os.getenv("CAI_MODEL", "alias0")
+    env = ENV.refresh()
+    agent_type = env.agent_type
+    model = env.model
     sess = SESSIONS.get(channel_id)
     if not sess or sess.agent_type != agent_type:
-        sess = AgentSession(channel_id, agent_type, model)
-        SESSIONS[channel_id] = sess
+        # Building an agent is synchronous and can be slow; keep the gateway responsive
+        new_sess = await asyncio.to_thread(AgentSession, channel_id, agent_type, model)
+        sess = SESSIONS.get(channel_id)
+        if not sess or sess.agent_type != agent_type:
+            # Nobody else created one for this channel while we were waiting
+            sess = new_sess
+            store_session(channel_id, sess)
     else:
+        SESSIONS.move_to_end(channel_id)
         if sess.model != model:
             update_agent_models_recursively(sess.agent, model)
             sess.model = model
     return sess
 
 # ---- Messaging helpers -----------------------------------------------------
+# User mentions, with or without the legacy nickname "!" marker
+_MENTION_RE = re.compile(r"<@!?\d+>")
+
 def _chunk_text(text: str, limit: int = 1900) -> List[str]:
     if not text:
         return [""]
-    chunks: List[str] = []
-    while text:
-        chunks.append(text[:limit])
-        text = text[limit:]
-    return chunks
+    return [text[i:i + limit] for i in range(0, len(text), limit)]
+
+def _last_chunk(text: str, limit: int = 1900) -> str:
+    """Same as _chunk_text(text, limit)[-1], without building the other chunks."""
+    if not text:
+        return ""
+    return text[(len(text) - 1) // limit * limit:]
 
 def _maybe_pretty_json(s: str) -> Tuple[str, Optional[str]]:
     """Return (formatted, ext) if JSON; else (original, None)."""
+    # Cheap prefix check so plain-text outputs never go through a parse attempt
+    if not s or s.lstrip()[:1] not in ("{", "["):
+        return s, None
     try:
         obj = json.loads(s)
         return json.dumps(obj, ensure_ascii=False, indent=2), "json"
@@ -228,24 +404,112 @@ def _build_tool_outputs(tool_outputs: List[Tuple[str, str]], small_limit: int =
     inline_parts: List[str] = []
     files: List[discord.File] = []
     for idx, (label, content) in enumerate(tool_outputs, start=1):
-        formatted, ext = _maybe_pretty_json(content or "")
+        content = content or ""
+        if len(content) > small_limit:
+            # Too long to inline anyway: upload the raw output without reformatting
+            fname = f"tool_output_{idx}.txt"
+            bio = BytesIO(content.encode("utf-8", errors="replace"))
+            files.append(discord.File(bio, filename=fname))
+            inline_parts.append(f"\n\n**{label}** → attached `{fname}`")
+            continue
+        formatted, ext = _maybe_pretty_json(content)
         if len(formatted) > small_limit:
+            # Only reached by small JSON that grew past the limit when indented
             fname = f"tool_output_{idx}.{ext or 'txt'}"
-            bio = BytesIO(formatted.encode("utf-8"))
+            bio = BytesIO(formatted.encode("utf-8", errors="replace"))
             files.append(discord.File(bio, filename=fname))
             inline_parts.append(f"\n\n**{label}** → attached `{fname}`")
         else:
             inline_parts.append(f"\n\n**{label}**\n```\n{formatted}\n```")
     return "".join(inline_parts), files
 
+class EditCoalescer:
+    """
+    Coalesce streamed edits of a single Discord message.
+
+    Callers push the latest accumulated text via set_latest(); a background
+    task emits at most one msg.edit per interval, always with the newest text,
+    so bursts of deltas don't turn into bursts of API calls.
+    """
+
+    def __init__(self, msg: discord.Message, interval: float = 1.0):
+        self.msg = msg
+        self.interval = interval
+        self._pending: Optional[str] = None
+        self._event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def set_latest(self, content: str) -> None:
+        self._pending = content
+        self._event.set()
+
+    async def stop(self) -> None:
+        """Stop the worker and drop any pending edit (caller does the final edit)."""
+        task, self._task = self._task, None
+        self._pending = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                # Never let a failed intermediate edit skip the caller's final edit
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            await self._event.wait()
+            await asyncio.sleep(self.interval)
+            self._event.clear()
+            content, self._pending = self._pending, None
+            if content is None:
+                continue
+            try:
+                await self.msg.edit(content=(_last_chunk(content) or "…"))
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    await asyncio.sleep(getattr(e, "retry_after", None) or self.interval)
+            except Exception as e:
+                # Network hiccups (aiohttp, timeouts, resets) only cost this edit
+                logging.debug(f"Streamed edit failed: {e!r}")
+
 # ---- Discord bot setup -----------------------------------------------------
+# Per-guild record of the last command set pushed, so restarts can skip resyncs
+BOT_STATE_FILE = Path(os.getenv("CAI_DISCORD_STATE_FILE", str(Path.home() / ".cai" / "discord_bot_state.json")))
+
+def _load_bot_state() -> Dict[str, Any]:
+    try:
+        with open(BOT_STATE_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def _save_bot_state(state: Dict[str, Any]) -> None:
+    try:
+        BOT_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so a crash mid-write never leaves a truncated file
+        tmp = BOT_STATE_FILE.with_name(f"{BOT_STATE_FILE.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, BOT_STATE_FILE)
+    except OSError as e:
+        logging.debug(f"Could not persist bot state to {BOT_STATE_FILE}: {e}")
+
 INTENTS = discord.Intents.default()
 # Enable message content so the bot can respond to @mentions
 INTENTS.message_content = True
+ALLOWED_MENTIONS = discord.AllowedMentions.none()
 
 class CAIBot(discord.Client):
     def __init__(self):
-        super().__init__(intents=INTENTS)
+        # Never ping users/roles/@everyone from agent output; set once for all sends
+        super().__init__(intents=INTENTS, allowed_mentions=ALLOWED_MENTIONS)
         self.tree = app_commands.CommandTree(self)
         self.allowed_guild = int(os.getenv("ALLOWED_GUILD_ID", "0")) or None
 
@@ -257,30 +521,55 @@ class CAIBot(discord.Client):
         else:
             await self.tree.sync()
 
+    def _command_version(self) -> str:
+        """Hash of the global command set, used to detect stale guild commands."""
+        # The full sync payload, so option types/choices/permissions changes also resync
+        payload = sorted(
+            (cmd.to_dict(self.tree) for cmd in self.tree.get_commands()),
+            key=lambda d: (d.get("type", 1), d["name"]),
+        )
+        return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def _sync_guild(self, guild: discord.abc.Snowflake) -> None:
+        # Purge stale: clear then push empty to delete remote commands
+        self.tree.clear_commands(guild=guild)
+        await self.tree.sync(guild=guild)
+        # Reinstall current global set into guild
+        self.tree.copy_global_to(guild=guild)
+        await self.tree.sync(guild=guild)
+
     async def on_ready(self):
         logging.info(f"Logged in as {self.user} (id={getattr(self.user, 'id', '?')}) | guilds={len(self.guilds)}")
         # If no allowed_guild configured, register commands per guild for instant availability
         if not self.allowed_guild:
-            for g in self.guilds:
-                try:
-                    # Purge stale: clear then push empty to delete remote commands
-                    self.tree.clear_commands(guild=g)
-                    await self.tree.sync(guild=g)
-                    # Reinstall current global set into guild
-                    self.tree.copy_global_to(guild=g)
-                    await self.tree.sync(guild=g)
-                    logging.info(f"Slash commands synced to guild {g.name} ({g.id})")
-                except Exception as e:
-                    logging.warning(f"Guild sync failed for {getattr(g, 'id', '?')}: {e}")
+            version = self._command_version()
+            state = _load_bot_state()
+            synced_versions = state.setdefault("guild_command_versions", {})
+            # Overlap the per-guild round trips, keeping well under the global rate limit
+            sem = asyncio.Semaphore(5)
+
+            async def sync_one(g: discord.Guild):
+                if synced_versions.get(str(g.id)) == version:
+                    # Same command set as the last successful sync: nothing to push
+                    return
+                async with sem:
+                    try:
+                        await self._sync_guild(g)
+                        synced_versions[str(g.id)] = version
+                        logging.info(f"Slash commands synced to guild {g.name} ({g.id})")
+                    except Exception as e:
+                        logging.warning(f"Guild sync failed for {getattr(g, 'id', '?')}: {e}")
+
+            await asyncio.gather(*(sync_one(g) for g in self.guilds))
+            _save_bot_state(state)
 
     async def on_guild_join(self, guild: discord.Guild):
         # Sync commands immediately when the bot joins a new guild
         try:
-            # Purge stale then reinstall
-            self.tree.clear_commands(guild=guild)
-            await self.tree.sync(guild=guild)
-            self.tree.copy_global_to(guild=guild)
-            await self.tree.sync(guild=guild)
+            await self._sync_guild(guild)
+            state = _load_bot_state()
+            state.setdefault("guild_command_versions", {})[str(guild.id)] = self._command_version()
+            _save_bot_state(state)
             logging.info(f"Slash commands synced on join: {guild.name} ({guild.id})")
         except Exception as e:
             logging.warning(f"Guild join sync failed for {getattr(guild, 'id', '?')}: {e}")
@@ -292,59 +581,53 @@ class CAIBot(discord.Client):
         if not self.user or self.user not in getattr(message, "mentions", []):
             return
 
-        channel_id = message.channel.id
-        session = await get_session(channel_id)
-
         # Extract prompt by removing mentions
-        content = message.content or ""
-        for m in message.mentions:
-            content = content.replace(f"<@{m.id}>", " ")
-            content = content.replace(f"<@!{m.id}>", " ")
-        prompt = content.strip()
+        prompt = _MENTION_RE.sub(" ", message.content or "").strip()
         if not prompt:
             await message.reply("Provide a prompt after the mention.")
             return
 
-        # Enforce turn cap
-        max_turns_raw = os.getenv("CAI_MAX_TURNS", "inf")
-        max_turns = float("inf") if max_turns_raw == "inf" else float(max_turns_raw)
-        if session.turns >= max_turns:
-            await message.reply(f"Turn limit reached ({int(max_turns) if max_turns!=float('inf') else '∞'}). Use /config to increase CAI_MAX_TURNS.")
+        channel_id = message.channel.id
+        session = await get_session(channel_id)
+
+        # Enforce turn cap before queueing behind a running turn
+        env = ENV.refresh()
+        if session.turns >= env.max_turns:
+            await message.reply(_turn_limit_message(env.max_turns))
             return
 
         async with session.lock:
+            # Turns that finished while we were waiting may have hit the cap
+            if session.turns >= env.max_turns:
+                await message.reply(_turn_limit_message(env.max_turns))
+                return
             try:
                 payload = session.build_history_context(prompt)
-                stream_env = (os.getenv("CAI_STREAM", "false") or "false").lower() == "true"
-
-                if stream_env:
+                if env.stream:
                     typing = message.channel.typing()
                     await typing.__aenter__()
                     msg = await message.reply("Thinking…")
-                    last_edit = 0.0
+                    coalescer = EditCoalescer(msg)
 
                     async def run_stream():
-                        nonlocal last_edit
                         result = Runner.run_streamed(session.agent, payload)
                         stream = result.stream_events()
                         final_text = ""
                         tool_pairs: List[Tuple[str, str]] = []
+                        coalescer.start()
                         try:
                             async for event in stream:
                                 name = getattr(event, "name", "")
                                 if name == "assistant_message_delta":
                                     delta = getattr(event.item, "delta", "") or ""
                                     final_text += delta
-                                    now = asyncio.get_event_loop().time()
-                                    if now - last_edit > 1.0:
-                                        chunks = _chunk_text(final_text)
-                                        await msg.edit(content=(chunks[-1] or "…"))
-                                        last_edit = now
+                                    coalescer.set_latest(final_text)
                                 elif name == "tool_output":
                                     item = event.item
                                     if isinstance(item, ToolCallOutputItem):
                                         tool_pairs.append(("Tool Output", item.output or ""))
                         finally:
+                            await coalescer.stop()
                             try:
                                 chunks = _chunk_text(final_text)
                                 inline, files = _build_tool_outputs(tool_pairs)
@@ -373,11 +656,11 @@ class CAIBot(discord.Client):
                             tool_pairs.append(("Tool Output", item.output or ""))
                     chunks = _chunk_text(text)
                     inline, files = _build_tool_outputs(tool_pairs)
-                    await message.reply((chunks[0] if chunks else "(no content)") + inline)
-                    for extra in chunks[1:]:
+                    # Tool snippets and attachments ride along with the last chunk
+                    *head, last = chunks
+                    for extra in head:
                         await message.reply(extra)
-                    if files:
-                        await message.reply(files=files)
+                    await message.reply(last + inline, files=files or None)
 
                 session.turns += 1
             except Exception as e:
@@ -397,51 +680,48 @@ async def ask(interaction: discord.Interaction, prompt: str):
     channel_id = interaction.channel_id
     session = await get_session(channel_id)
 
-    # Enforce per-channel turn cap
-    max_turns_raw = os.getenv("CAI_MAX_TURNS", "inf")
-    max_turns = float("inf") if max_turns_raw == "inf" else float(max_turns_raw)
-    if session.turns >= max_turns:
-        await interaction.followup.send(f"Turn limit reached ({int(max_turns) if max_turns!=float('inf') else '∞'}). Use /config to increase CAI_MAX_TURNS.")
+    # Enforce per-channel turn cap before queueing behind a running turn
+    env = ENV.refresh()
+    if session.turns >= env.max_turns:
+        await interaction.followup.send(_turn_limit_message(env.max_turns))
         return
 
     async with session.lock:
+        # Turns that finished while we were waiting may have hit the cap
+        if session.turns >= env.max_turns:
+            await interaction.followup.send(_turn_limit_message(env.max_turns))
+            return
         try:
             # Build input (carry over history)
             payload = session.build_history_context(prompt)
 
             # Stream or not
-            stream_env = (os.getenv("CAI_STREAM", "false") or "false").lower() == "true"
-
-            if stream_env:
+            if env.stream:
                 # Basic streamed editing: update a single message as tokens arrive
-                # using periodic edits to avoid rate limits
+                # using coalesced periodic edits to avoid rate limits
                 msg = await interaction.followup.send("Thinking…")
-                last_edit = 0.0
+                coalescer = EditCoalescer(msg)
 
                 async def run_stream():
-                    nonlocal last_edit
                     result = Runner.run_streamed(session.agent, payload)
                     stream = result.stream_events()
                     final_text = ""
                     tool_pairs: List[Tuple[str, str]] = []
+                    coalescer.start()
                     try:
                         async for event in stream:
                             name = getattr(event, "name", "")
                             if name == "assistant_message_delta":
-                                # accumulate text; edit at most ~1/sec
+                                # accumulate text; the coalescer edits at most ~1/sec
                                 delta = getattr(event.item, "delta", "") or ""
                                 final_text += delta
-                                now = asyncio.get_event_loop().time()
-                                if now - last_edit > 1.0:
-                                    # Edit only the last chunk to keep under limits
-                                    chunks = _chunk_text(final_text)
-                                    await msg.edit(content=(chunks[-1] or "…"))
-                                    last_edit = now
+                                coalescer.set_latest(final_text)
                             elif name == "tool_output":
                                 item = event.item
                                 if isinstance(item, ToolCallOutputItem):
                                     tool_pairs.append(("Tool Output", item.output or ""))
                     finally:
+                        await coalescer.stop()
                         try:
                             chunks = _chunk_text(final_text)
                             inline, files = _build_tool_outputs(tool_pairs)
@@ -468,14 +748,15 @@ async def ask(interaction: discord.Interaction, prompt: str):
 
                 chunks = _chunk_text(text)
                 inline, files = _build_tool_outputs(tool_pairs)
-                # Send primary content
-                await interaction.followup.send((chunks[0] if chunks else "(no content)") + inline)
-                # Send remainder chunks
-                for extra in chunks[1:]:
+                # Send all but the last chunk as-is
+                *head, last = chunks
+                for extra in head:
                     await interaction.followup.send(extra)
-                # Attach files if any
+                # Last chunk carries the tool snippets and any attachments
                 if files:
-                    await interaction.followup.send(files=files)
+                    await interaction.followup.send(last + inline, files=files)
+                else:
+                    await interaction.followup.send(last + inline)
 
             session.turns += 1
         except Exception as e:
@@ -489,8 +770,8 @@ async def agent(interaction: discord.Interaction, agent_name: str):
     await interaction.response.defer(thinking=True, ephemeral=True)
     channel_id = interaction.channel_id
     # Force new session with requested agent
-    model = os.getenv("CAI_MODEL", "alias0")
-    SESSIONS[channel_id] = AgentSession(channel_id, agent_name, model)
+    model = ENV.refresh().model
+    store_session(channel_id, await asyncio.to_thread(AgentSession, channel_id, agent_name, model))
     await interaction.followup.send(f"Agent switched to `{agent_name}` for this channel.")
 
 
@@ -504,11 +785,12 @@ async def config(interaction: discord.Interaction, key: str, value: str):
         await interaction.followup.send("Only CAI_* or CTF_* keys are allowed.")
         return
     os.environ[key_upper] = value
+    ENV.invalidate()
     # Apply model change to current session if relevant
     if key_upper in ("CAI_MODEL",):
         sess = await get_session(interaction.channel_id)
-        update_agent_models_recursively(sess.agent, os.getenv("CAI_MODEL", "alias0"))
-        sess.model = os.getenv("CAI_MODEL", "alias0")
+        update_agent_models_recursively(sess.agent, ENV.model)
+        sess.model = ENV.model
     await interaction.followup.send(f"Set `{key_upper}={value}`")
 
 
@@ -526,9 +808,8 @@ async def session(interaction: discord.Interaction):
     logging.info(f"/session invoked by {getattr(interaction.user, 'id', '?')} in {interaction.channel_id}")
     await interaction.response.defer(thinking=False, ephemeral=True)
     sess = await get_session(interaction.channel_id)
-    max_turns_raw = os.getenv("CAI_MAX_TURNS", "inf")
     await interaction.followup.send(
-        f"Agent: `{sess.agent_type}`\nModel: `{sess.model}`\nTurns: {sess.turns}/{max_turns_raw}"
+        f"Agent: `{sess.agent_type}`\nModel: `{sess.model}`\nTurns: {sess.turns}/{ENV.refresh().max_turns_raw}"
     )
 
 
@@ -592,6 +873,12 @@ def main():
     token = os.getenv("DISCORD_TOKEN")
     if not token:
         raise SystemExit("DISCORD_TOKEN is required")
+    try:
+        # libuv-backed loop when available (optional dependency, not on Windows)
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     logging.getLogger("discord").setLevel(logging.WARNING)
     bot.run(token)
 
@@ -3,7 +3,8 @@
 BBOT generic command tool for reconnaissance scans.
 
 This version ENFORCES reading `bbot --help` BEFORE running any command.
-If help fails, the command will NOT run.
+If help fails, the command will NOT run. The full help is shown once per agent
+run; later calls in the same run get a short marker with the help's hash.
 
 Recommended usage patterns:
 
@@ -22,28 +23,188 @@ Other common flags:
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import os
 import time
-from cai.sdk.agents import function_tool
+from pathlib import Path
+from typing import Any, Optional
+
+from cai.sdk.agents import RunContextWrapper, function_tool
 from cai.tools.common import run_command_async  # pylint: disable=import-error
 
-# Cache TTL for help output (seconds). We still SHOW help every run (preamble),
-# but caching reduces the extra subprocess cost when runs happen back-to-back.
+# Cache TTL for help output (seconds). We SHOW help once per agent run (preamble),
+# and caching reduces the extra subprocess cost when runs happen back-to-back.
 _HELP_TTL = 6 * 60 * 60  # 6 hours
-_bbot_help_cache: dict[str, float | str] = {"ts": 0.0, "text": ""}
+# Past the TTL, stale help is still served for this long while a background
+# refresh runs, so no caller has to wait on `bbot --help` at the TTL boundary.
+_HELP_STALE_WINDOW = 60 * 60  # 1 hour
+_bbot_help_cache: dict[str, float | str] = {"ts": 0.0, "text": "", "key": "", "hash": ""}
+# Attribute set on the run context once the help preamble has been delivered
+_HELP_SHOWN_ATTR = "_cai_bbot_help_shown"
+# Serializes help fetches so concurrent cache misses spawn `bbot --help` once.
+# Created lazily so it binds to the running event loop.
+_bbot_help_lock: Optional[asyncio.Lock] = None
+_bbot_help_refreshes: dict[str, asyncio.Task] = {}
+# On-disk copies of the help cache (one file per execution target) so restarts
+# don't re-run `bbot --help`
+_HELP_CACHE_DIR = Path.home() / ".cai" / "cache"
+_bbot_help_disk_loaded: set[str] = set()
+# Output of a failed `bbot --help` (run_command_async returns it instead of raising)
+_HELP_FAILURE_MARKERS = (
+    "command not found",
+    "no such file or directory",
+    "permission denied",
+    "command exited with code",
+    "command timed out after",
+)
+# Cap on concurrent `bbot` scans; each one is CPU- and FD-heavy
+_BBOT_PARALLEL = max(1, int(os.getenv("CAI_BBOT_PARALLEL", "2")))
+_bbot_run_sem: Optional[asyncio.Semaphore] = None
+# Full help preamble, formatted once per help text (keyed by its hash)
+_HELP_PREAMBLE = (
+    "### BBOT --help (for context) ###\n"
+    "{help}\n"
+    "### END HELP ###\n\n"
+    ">>> Proceeding to run your BBOT command...\n"
+)
+_bbot_preamble_cache: dict[str, str] = {"hash": "", "text": ""}
+
+
+def _skip_help() -> bool:
+    # Scripted/test callers set CAI_TOOL_SKIP_HELP=1; the help preamble is for the LLM
+    return os.getenv("CAI_TOOL_SKIP_HELP") == "1"
+
+
+def _help_hash(help_text: str) -> str:
+    return hashlib.sha256(help_text.encode("utf-8", errors="replace")).hexdigest()[:12]
+
+
+def _execution_target() -> str:
+    """Where run_command_async will run `bbot` (same precedence: container, SSH, local)."""
+    is_ssh_env = all(os.getenv(var) for var in ["SSH_USER", "SSH_HOST"])
+    active_container = os.getenv("CAI_ACTIVE_CONTAINER", "")
+    if active_container and not is_ssh_env:
+        return f"container:{active_container}"
+    if is_ssh_env:
+        return f"ssh:{os.getenv('SSH_USER')}@{os.getenv('SSH_HOST')}"
+    return "local"
+
+
+def _looks_like_help(text: str) -> bool:
+    """Whether `bbot --help` output is real help rather than an error message."""
+    lowered = text.strip().lower()
+    return bool(lowered) and not any(marker in lowered for marker in _HELP_FAILURE_MARKERS)
+
+
+def _help_cache_file(key: str) -> Path:
+    return _HELP_CACHE_DIR / f"bbot_help.{_help_hash(key)}.json"
+
+
+def _load_bbot_help_from_disk(key: str) -> None:
+    """Seed the in-memory cache for `key` from disk (once per key and process)."""
+    _bbot_help_disk_loaded.add(key)
+    try:
+        with open(_help_cache_file(key), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data["key"] == key and _looks_like_help(str(data["text"])):
+            _bbot_help_cache.update(
+                ts=float(data["ts"]),
+                text=str(data["text"]),
+                key=key,
+                hash=str(data.get("hash", "")),
+            )
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+
+def _save_bbot_help_to_disk(key: str) -> None:
+    # Write-then-rename so concurrent workers never see a partial file
+    try:
+        path = _help_cache_file(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_bbot_help_cache, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _cached_bbot_help(key: str, max_age: float = _HELP_TTL) -> str:
+    """Return the cached help text for `key` if younger than `max_age`, else an empty string."""
+    if key not in _bbot_help_disk_loaded and _bbot_help_cache.get("key") != key:
+        _load_bbot_help_from_disk(key)
+    if _bbot_help_cache.get("key") != key:
+        return ""
+    if time.time() - float(_bbot_help_cache.get("ts", 0.0)) < max_age:
+        return str(_bbot_help_cache.get("text", ""))
+    return ""
+
+
+def _get_bbot_help_lock() -> asyncio.Lock:
+    global _bbot_help_lock
+    if _bbot_help_lock is None:
+        _bbot_help_lock = asyncio.Lock()
+    return _bbot_help_lock
+
+
+def _get_bbot_run_semaphore() -> asyncio.Semaphore:
+    global _bbot_run_sem
+    if _bbot_run_sem is None:
+        _bbot_run_sem = asyncio.Semaphore(_BBOT_PARALLEL)
+    return _bbot_run_sem
+
+
+async def _refresh_bbot_help_background(key: str) -> None:
+    try:
+        async with _get_bbot_help_lock():
+            if not _cached_bbot_help(key):
+                await _fetch_bbot_help(key)
+    except Exception:  # noqa: BLE001
+        # Keep serving the stale text; the next caller past the window will retry
+        pass
 
 
 async def _get_bbot_help_text(force_refresh: bool = False) -> str:
-    """Get (and cache) `bbot --help` text. Raise on failure so callers can decide behavior."""
-    now = time.time()
-    if not force_refresh and now - float(_bbot_help_cache.get("ts", 0.0)) < _HELP_TTL:
-        cached = str(_bbot_help_cache.get("text", ""))
+    """
+    Get (and cache) `bbot --help` text. Cache key depends on the execution target so
+    help from one container/host is not served for another.
+    Raise on failure so callers can decide behavior.
+    """
+    key = f"help::{_execution_target()}"
+    if not force_refresh:
+        cached = _cached_bbot_help(key)
         if cached:
             return cached
+        stale = _cached_bbot_help(key, max_age=_HELP_TTL + _HELP_STALE_WINDOW)
+        if stale:
+            refresh = _bbot_help_refreshes.get(key)
+            if refresh is None or refresh.done():
+                _bbot_help_refreshes[key] = asyncio.create_task(_refresh_bbot_help_background(key))
+            return stale
+
+    async with _get_bbot_help_lock():
+        # Another caller may have refreshed the cache while we were waiting
+        if not force_refresh:
+            cached = _cached_bbot_help(key)
+            if cached:
+                return cached
+        return await _fetch_bbot_help(key)
 
-    # Fetch fresh help
+
+async def _fetch_bbot_help(key: str) -> str:
+    now = time.time()
     help_text = await run_command_async("bbot --help", timeout=180, stream=False, tool_name="bbot")
+    if not _looks_like_help(help_text):
+        # Never cache (or persist) an error message as help
+        raise RuntimeError(help_text.strip() or "`bbot --help` produced no output")
     _bbot_help_cache["ts"] = now
     _bbot_help_cache["text"] = help_text
+    _bbot_help_cache["key"] = key
+    _bbot_help_cache["hash"] = _help_hash(help_text)
+    _save_bbot_help_to_disk(key)
     return help_text
 
 
@@ -56,8 +217,52 @@ async def bbot_help() -> str:
     return await _get_bbot_help_text(force_refresh=True)
 
 
+async def _run_bbot(ctx: RunContextWrapper[Any], args: str, skip_help: bool = False) -> str:
+    """Run BBOT; `skip_help` drops the help preamble (and its fetch) for non-LLM callers."""
+    preamble = ""
+    if not skip_help:
+        # 1) Obtain help (and show it). If this fails, abort to avoid running with wrong assumptions.
+        try:
+            help_text = await _get_bbot_help_text(force_refresh=False)
+        except Exception as e:  # noqa: BLE001
+            return (
+                "### BBOT --help (failed) ###\n"
+                f"{str(e)}\n"
+                "Refusing to run `bbot` because help could not be retrieved. "
+                "Please ensure BBOT is installed and available in PATH.\n"
+            )
+
+        help_hash = str(_bbot_help_cache.get("hash", "")) or _help_hash(help_text)
+        if getattr(ctx, _HELP_SHOWN_ATTR, None) == help_hash:
+            preamble = (
+                f"### BBOT --help already shown this session (sha256:{help_hash}) ###\n"
+                ">>> Proceeding to run your BBOT command...\n"
+            )
+        else:
+            if _bbot_preamble_cache["hash"] != help_hash:
+                _bbot_preamble_cache["text"] = _HELP_PREAMBLE.format(help=help_text)
+                _bbot_preamble_cache["hash"] = help_hash
+            preamble = _bbot_preamble_cache["text"]
+            try:
+                setattr(ctx, _HELP_SHOWN_ATTR, help_hash)
+            except AttributeError:
+                pass
+
+    cmd = f"bbot {args.strip()}" if args and args.strip() else "bbot"
+    # 2) Run the command (streaming). We return preamble + streamed output.
+    try:
+        async with _get_bbot_run_semaphore():
+            run_output = await run_command_async(cmd, timeout=8 * 60 * 60, stream=True, tool_name="bbot")
+    except Exception as e:  # noqa: BLE001
+        error = f"[BBOT RUN ERROR] {str(e)}"
+        return f"{preamble}\n{error}" if preamble else error
+
+    # 3) Combine and return
+    return f"{preamble}\n{run_output}" if preamble else run_output
+
+
 @function_tool
-async def bbot_cmd(args: str) -> str:
+async def bbot_cmd(ctx: RunContextWrapper[Any], args: str) -> str:
     """
     Run BBOT with raw CLI arguments, but ONLY AFTER printing `bbot --help` so the agent reads usage.
 
@@ -66,32 +271,7 @@ async def bbot_cmd(args: str) -> str:
 
     Behavior:
       - Prepend the latest `bbot --help` output (preamble) so the model always “reads” guidance first.
+        Within one run the full help is shown once; afterwards a short marker is shown unless it changed.
       - If `bbot --help` fails, DO NOT run the main command; return the help error so the issue is fixed first.
     """
-    # 1) Obtain help (and show it). If this fails, abort to avoid running with wrong assumptions.
-    try:
-        help_text = await _get_bbot_help_text(force_refresh=False)
-    except Exception as e:  # noqa: BLE001
-        return (
-            "### BBOT --help (failed) ###\n"
-            f"{str(e)}\n"
-            "Refusing to run `bbot` because help could not be retrieved. "
-            "Please ensure BBOT is installed and available in PATH.\n"
-        )
-
-    preamble = (
-        "### BBOT --help (for context) ###\n"
-        f"{help_text}\n"
-        "### END HELP ###\n\n"
-        ">>> Proceeding to run your BBOT command...\n"
-    )
-
-    cmd = f"bbot {args.strip()}" if args and args.strip() else "bbot"
-    # 2) Run the command (streaming). We return preamble + streamed output.
-    try:
-        run_output = await run_command_async(cmd, timeout=8 * 60 * 60, stream=True, tool_name="bbot")
-    except Exception as e:  # noqa: BLE001
-        return f"{preamble}\n[BBOT RUN ERROR] {str(e)}"
-
-    # 3) Combine and return
-    return f"{preamble}\n{run_output}"
+    return await _run_bbot(ctx, args, skip_help=_skip_help())
@@ -3,7 +3,8 @@
 ReconFTW generic command tool for reconnaissance workflows.
 
 This version ENFORCES reading `<script> -h` BEFORE running any command.
-If help fails, the command will NOT run.
+If help fails, the command will NOT run. The full help is shown once per agent
+run; later calls in the same run get a short marker with the help's hash.
 
 Recommended usage patterns:
 
@@ -24,24 +25,78 @@ Script path resolution order:
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import os
 import shlex
 import time
-from typing import Optional, List
+from pathlib import Path
+from typing import Any, Optional, List
 
-from cai.sdk.agents import function_tool
+from cai.sdk.agents import RunContextWrapper, function_tool
 from cai.tools.common import run_command_async  # pylint: disable=import-error
 
 # Cache TTL for help output (seconds)
 _HELP_TTL = 6 * 60 * 60  # 6 hours
-_recon_help_cache: dict[str, float | str] = {"ts": 0.0, "text": "", "key": ""}
+# Past the TTL, stale help is still served for this long while a background
+# refresh runs, so no caller has to wait on `<script> -h` at the TTL boundary.
+_HELP_STALE_WINDOW = 60 * 60  # 1 hour
+_recon_help_cache: dict[str, float | str] = {"ts": 0.0, "text": "", "key": "", "hash": ""}
+# Attribute set on the run context once the help preamble has been delivered
+_HELP_SHOWN_ATTR = "_cai_reconftw_help_shown"
+# One lock per help cache key (script path) so concurrent cache misses spawn
+# `<script> -h` once. Locks are created lazily to bind to the running loop.
+_recon_help_locks: dict[str, asyncio.Lock] = {}
+_recon_help_refreshes: dict[str, asyncio.Task] = {}
+# On-disk copies of the help cache (one file per script) so restarts don't re-run `<script> -h`
+_HELP_CACHE_DIR = Path.home() / ".cai" / "cache"
+_recon_help_disk_loaded: set[str] = set()
+# Output of a failed `<script> -h` (run_command_async returns it instead of raising)
+_HELP_FAILURE_MARKERS = (
+    "command not found",
+    "no such file or directory",
+    "permission denied",
+    "command exited with code",
+    "command timed out after",
+)
+# Cap on concurrent `reconftw` scans; each one is CPU- and FD-heavy
+_RECONFTW_PARALLEL = max(1, int(os.getenv("CAI_RECONFTW_PARALLEL", "2")))
+_reconftw_run_sem: Optional[asyncio.Semaphore] = None
+# Full help preamble, formatted once per help text (keyed by its hash)
+_HELP_PREAMBLE = (
+    "### {script} -h (for context) ###\n"
+    "{help}\n"
+    "### END HELP ###\n\n"
+    ">>> Proceeding to run your ReconFTW command...\n"
+)
+_recon_preamble_cache: dict[str, str] = {"hash": "", "text": ""}
+
+
+def _skip_help() -> bool:
+    # Scripted/test callers set CAI_TOOL_SKIP_HELP=1; the help preamble is for the LLM
+    return os.getenv("CAI_TOOL_SKIP_HELP") == "1"
+
+
+def _help_hash(help_text: str) -> str:
+    return hashlib.sha256(help_text.encode("utf-8", errors="replace")).hexdigest()[:12]
+
+
+# Successful script resolutions keyed by (override, $RECONFTW_PATH). Misses are
+# not cached so installing reconftw later is picked up without a restart.
+_resolved_script_paths: dict[tuple[Optional[str], Optional[str]], str] = {}
 
 
 def _resolve_script_path(override: Optional[str] = None) -> str:
+    env_path = os.getenv("RECONFTW_PATH")
+    cache_key = (override, env_path)
+    cached = _resolved_script_paths.get(cache_key)
+    if cached is not None:
+        return cached
+
     candidates: List[str] = []
     if override:
         candidates.append(override)
-    env_path = os.getenv("RECONFTW_PATH")
     if env_path:
         candidates.append(env_path)
     candidates += [
@@ -50,23 +105,126 @@ def _resolve_script_path(override: Optional[str] = None) -> str:
     ]
     for p in candidates:
         if p and os.path.exists(p) and os.access(p, os.X_OK):
+            # Absolute once here, so help cache keys need no per-call abspath
+            p = _resolved_script_paths[cache_key] = os.path.abspath(p)
             return p
     # Fall back to the best hint for error messages
     return override or env_path or "reconftw.sh"
 
 
+def _execution_target() -> str:
+    """Where run_command_async will run the script (same precedence: container, SSH, local)."""
+    is_ssh_env = all(os.getenv(var) for var in ["SSH_USER", "SSH_HOST"])
+    active_container = os.getenv("CAI_ACTIVE_CONTAINER", "")
+    if active_container and not is_ssh_env:
+        return f"container:{active_container}"
+    if is_ssh_env:
+        return f"ssh:{os.getenv('SSH_USER')}@{os.getenv('SSH_HOST')}"
+    return "local"
+
+
+def _looks_like_help(text: str) -> bool:
+    """Whether `<script> -h` output is real help rather than an error message."""
+    lowered = text.strip().lower()
+    return bool(lowered) and not any(marker in lowered for marker in _HELP_FAILURE_MARKERS)
+
+
+def _help_cache_file(key: str) -> Path:
+    return _HELP_CACHE_DIR / f"reconftw_help.{_help_hash(key)}.json"
+
+
+def _load_reconftw_help_from_disk(key: str) -> None:
+    """Seed the in-memory cache for `key` from disk (once per key and process)."""
+    _recon_help_disk_loaded.add(key)
+    try:
+        with open(_help_cache_file(key), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data["key"] == key and _looks_like_help(str(data["text"])):
+            _recon_help_cache.update(
+                ts=float(data["ts"]), text=str(data["text"]), key=key, hash=str(data.get("hash", ""))
+            )
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+
+def _save_reconftw_help_to_disk(key: str) -> None:
+    # Write-then-rename so concurrent workers never see a partial file
+    try:
+        path = _help_cache_file(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_recon_help_cache, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _cached_reconftw_help(key: str, max_age: float = _HELP_TTL) -> str:
+    """Return the cached help text for `key` if younger than `max_age`, else an empty string."""
+    if key not in _recon_help_disk_loaded and _recon_help_cache.get("key") != key:
+        _load_reconftw_help_from_disk(key)
+    if _recon_help_cache.get("key") == key and time.time() - float(_recon_help_cache.get("ts", 0.0)) < max_age:
+        return str(_recon_help_cache.get("text", ""))
+    return ""
+
+
+def _get_reconftw_help_lock(key: str) -> asyncio.Lock:
+    lock = _recon_help_locks.get(key)
+    if lock is None:
+        lock = _recon_help_locks[key] = asyncio.Lock()
+    return lock
+
+
+def _get_reconftw_run_semaphore() -> asyncio.Semaphore:
+    global _reconftw_run_sem
+    if _reconftw_run_sem is None:
+        _reconftw_run_sem = asyncio.Semaphore(_RECONFTW_PARALLEL)
+    return _reconftw_run_sem
+
+
+async def _refresh_reconftw_help_background(script: str, key: str) -> None:
+    try:
+        async with _get_reconftw_help_lock(key):
+            if not _cached_reconftw_help(key):
+                await _fetch_reconftw_help(script, key)
+    except Exception:  # noqa: BLE001
+        # Keep serving the stale text; the next caller past the window will retry
+        pass
+
+
 async def _get_reconftw_help_text(script: str, force_refresh: bool = False) -> str:
     """
-    Get (and cache) `<script> -h` text. Cache key depends on script path so we don't mix outputs.
+    Get (and cache) `<script> -h` text. Cache key depends on the execution target and
+    script path so we don't mix outputs.
     Raise on failure so callers can decide behavior.
     """
-    key = f"help::{os.path.abspath(script)}"
-    now = time.time()
-    if not force_refresh and _recon_help_cache.get("key") == key and now - float(_recon_help_cache.get("ts", 0.0)) < _HELP_TTL:
-        cached = str(_recon_help_cache.get("text", ""))
+    script_key = script if os.path.isabs(script) else os.path.abspath(script)
+    key = f"help::{_execution_target()}::{script_key}"
+    if not force_refresh:
+        cached = _cached_reconftw_help(key)
         if cached:
             return cached
+        stale = _cached_reconftw_help(key, max_age=_HELP_TTL + _HELP_STALE_WINDOW)
+        if stale:
+            refresh = _recon_help_refreshes.get(key)
+            if refresh is None or refresh.done():
+                _recon_help_refreshes[key] = asyncio.create_task(
+                    _refresh_reconftw_help_background(script, key)
+                )
+            return stale
 
+    async with _get_reconftw_help_lock(key):
+        # Another caller may have refreshed the cache while we were waiting
+        if not force_refresh:
+            cached = _cached_reconftw_help(key)
+            if cached:
+                return cached
+        return await _fetch_reconftw_help(script, key)
+
+
+async def _fetch_reconftw_help(script: str, key: str) -> str:
+    now = time.time()
     # Validate executability early for a clearer error
     if not os.path.exists(script):
         raise FileNotFoundError(f"ReconFTW script not found at: {script}")
@@ -76,9 +234,15 @@ async def _get_reconftw_help_text(script: str, force_refresh: bool = False) -> s
     # Fetch fresh help
     cmd = f"{shlex.quote(script)} -h"
     help_text = await run_command_async(cmd, timeout=180, stream=False, tool_name="reconftw")
+    if not _looks_like_help(help_text):
+        # Never cache (or persist) an error message as help
+        raise RuntimeError(help_text.strip() or f"`{script} -h` produced no output")
     _recon_help_cache["ts"] = now
     _recon_help_cache["text"] = help_text
     _recon_help_cache["key"] = key
+    # Keyed by script too, so switching scripts mid-run shows the new help
+    _recon_help_cache["hash"] = _help_hash(f"{key}\0{help_text}")
+    _save_reconftw_help_to_disk(key)
     return help_text
 
 
@@ -92,46 +256,69 @@ async def reconftw_help(script_path: Optional[str] = None) -> str:
     return await _get_reconftw_help_text(script, force_refresh=True)
 
 
-@function_tool
-async def reconftw_cmd(args: str, script_path: Optional[str] = None) -> str:
-    """
-    Run reconftw.sh with raw CLI args, but ONLY AFTER printing `<script> -h` so the agent reads usage.
-
-    DEFAULT COMMAND (khuyến nghị):
-      reconftw_cmd("-d example.com -r")
-
-    Behavior:
-      - Prepend the latest `<script> -h` output (preamble) so the model always “reads” guidance first.
-      - If help fails, DO NOT run the main command; return the help error so the issue is fixed first.
-    """
+async def _run_reconftw(
+    ctx: RunContextWrapper[Any], args: str, script_path: Optional[str] = None, skip_help: bool = False
+) -> str:
+    """Run reconftw; `skip_help` drops the help preamble (and its fetch) for non-LLM callers."""
     script = _resolve_script_path(script_path)
 
-    # 1) Obtain help (and show it). If this fails, abort to avoid running with wrong assumptions.
-    try:
-        help_text = await _get_reconftw_help_text(script, force_refresh=False)
-    except Exception as e:  # noqa: BLE001
-        return (
-            f"### ReconFTW help for {script} (failed) ###\n"
-            f"{str(e)}\n"
-            "Refusing to run reconftw because help could not be retrieved. "
-            "Please ensure the script path is correct and executable.\n"
-        )
-
-    preamble = (
-        f"### {os.path.basename(script)} -h (for context) ###\n"
-        f"{help_text}\n"
-        "### END HELP ###\n\n"
-        ">>> Proceeding to run your ReconFTW command...\n"
-    )
+    preamble = ""
+    if not skip_help:
+        # 1) Obtain help (and show it). If this fails, abort to avoid running with wrong assumptions.
+        try:
+            help_text = await _get_reconftw_help_text(script, force_refresh=False)
+        except Exception as e:  # noqa: BLE001
+            return (
+                f"### ReconFTW help for {script} (failed) ###\n"
+                f"{str(e)}\n"
+                "Refusing to run reconftw because help could not be retrieved. "
+                "Please ensure the script path is correct and executable.\n"
+            )
+
+        help_hash = str(_recon_help_cache.get("hash", "")) or _help_hash(help_text)
+        if getattr(ctx, _HELP_SHOWN_ATTR, None) == help_hash:
+            preamble = (
+                f"### {os.path.basename(script)} -h already shown this session (sha256:{help_hash}) ###\n"
+                ">>> Proceeding to run your ReconFTW command...\n"
+            )
+        else:
+            if _recon_preamble_cache["hash"] != help_hash:
+                _recon_preamble_cache["text"] = _HELP_PREAMBLE.format(
+                    script=os.path.basename(script), help=help_text
+                )
+                _recon_preamble_cache["hash"] = help_hash
+            preamble = _recon_preamble_cache["text"]
+            try:
+                setattr(ctx, _HELP_SHOWN_ATTR, help_hash)
+            except AttributeError:
+                pass
 
     tail = args.strip() if args else ""
     cmd = f"{shlex.quote(script)} {tail}".strip()
 
     # 2) Run the command (streaming). We return preamble + streamed output.
     try:
-        run_output = await run_command_async(cmd, timeout=8 * 60 * 60, stream=True, tool_name="reconftw")
+        async with _get_reconftw_run_semaphore():
+            run_output = await run_command_async(cmd, timeout=8 * 60 * 60, stream=True, tool_name="reconftw")
     except Exception as e:  # noqa: BLE001
-        return f"{preamble}\n[RECONFTW RUN ERROR] {str(e)}"
+        error = f"[RECONFTW RUN ERROR] {str(e)}"
+        return f"{preamble}\n{error}" if preamble else error
 
     # 3) Combine and return
-    return f"{preamble}\n{run_output}"
+    return f"{preamble}\n{run_output}" if preamble else run_output
+
+
+@function_tool
+async def reconftw_cmd(ctx: RunContextWrapper[Any], args: str, script_path: Optional[str] = None) -> str:
+    """
+    Run reconftw.sh with raw CLI args, but ONLY AFTER printing `<script> -h` so the agent reads usage.
+
+    DEFAULT COMMAND (khuyến nghị):
+      reconftw_cmd("-d example.com -r")
+
+    Behavior:
+      - Prepend the latest `<script> -h` output (preamble) so the model always “reads” guidance first.
+        Within one run the full help is shown once; afterwards a short marker is shown unless it changed.
+      - If help fails, DO NOT run the main command; return the help error so the issue is fixed first.
+    """
+    return await _run_reconftw(ctx, args, script_path, skip_help=_skip_help())
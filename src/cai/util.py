@@ -1053,6 +1053,7 @@ def fix_litellm_transcription_annotations():
     Apply a monkey patch to fix the TranscriptionCreateParams.__annotations__ issue in LiteLLM.
 
     This is a temporary fix until the issue is fixed in the LiteLLM library itself.
+    Calling it again once the patch is in place is a no-op.
     """
     try:
         import litellm.litellm_core_utils.model_param_helper as model_param_helper
@@ -1061,6 +1062,8 @@ def fix_litellm_transcription_annotations():
         original_get_transcription_kwargs = (
             model_param_helper.ModelParamHelper._get_litellm_supported_transcription_kwargs
         )
+        if getattr(original_get_transcription_kwargs, "_cai_patched", False):
+            return True
 
         def safe_get_transcription_kwargs():
             """A safer version that doesn't rely on __annotations__."""
@@ -1080,6 +1083,8 @@ def fix_litellm_transcription_annotations():
                 ]
             )
 
+        safe_get_transcription_kwargs._cai_patched = True
+
         # Apply the monkey patch
         model_param_helper.ModelParamHelper._get_litellm_supported_transcription_kwargs = (
             safe_get_transcription_kwargs
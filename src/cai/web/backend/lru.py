@@ -0,0 +1,64 @@
+"""
+Capacity-bounded LRU mapping used for the session and task stores
+"""
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Optional
+
+
+class LRUDict(OrderedDict):
+    """OrderedDict that evicts least recently used entries past `maxsize`
+
+    Only entries for which `evictable(value)` is true are evicted, so live
+    entries (e.g. running tasks) can push the map over capacity until they
+    finish. `on_evict(key, value)` is called for each evicted entry.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        evictable: Optional[Callable[[Any], bool]] = None,
+        on_evict: Optional[Callable[[Any, Any], None]] = None
+    ):
+        super().__init__()
+        self.maxsize = maxsize
+        self._evictable = evictable
+        self._on_evict = on_evict
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self._evict()
+
+    def copy(self) -> "LRUDict":
+        """Shallow copy with the same capacity and callbacks, in the same order"""
+        new = type(self)(self.maxsize, self._evictable, self._on_evict)
+        for key, value in self.items():
+            # Bypass __setitem__: copying must not evict (or call on_evict)
+            OrderedDict.__setitem__(new, key, value)
+        return new
+
+    def _evict(self):
+        excess = len(self) - self.maxsize
+        victims = []
+        # The newest entry (the one just set) is never a candidate
+        for key, value in islice(self.items(), len(self) - 1):
+            if len(victims) == excess:
+                break
+            if self._evictable is None or self._evictable(value):
+                victims.append((key, value))
+        for key, value in victims:
+            super().__delitem__(key)
+            if self._on_evict is not None:
+                self._on_evict(key, value)
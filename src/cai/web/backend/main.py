@@ -2,31 +2,36 @@
 CAI Web Backend - FastAPI application for managing CAI sessions
 """
 import asyncio
+import functools
+import os
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel, Field
 from enum import Enum
-import json
 
 from cai.web.backend.models import (
     Session, Task, TaskStatus, SessionCreate, SessionResponse,
-    TaskResponse, AgentInfo, MessageRequest, ChatMessage
+    TaskResponse, AgentInfo, MessageRequest, ChatMessage, ChatMessageDict
 )
+from cai.web.backend.metrics import metrics_app, phase_timer
 from cai.web.backend.session_manager import SessionManager
 from cai.web.backend.task_manager import TaskManager
-from cai.web.backend.websocket_manager import WebSocketManager
+# Shared instance: TaskManager broadcasts task updates through the same manager
+from cai.web.backend.websocket_manager import websocket_manager, loads, orjson
 
 
 # Initialize managers
-session_manager = SessionManager()
 task_manager = TaskManager()
-websocket_manager = WebSocketManager()
+session_manager = SessionManager(task_manager)
+
+# Chat turns finishing in the background after POST /messages returned
+_pending_turns: Set[asyncio.Task] = set()
 
 
 @asynccontextmanager
@@ -36,6 +41,8 @@ async def lifespan(app: FastAPI):
     task_manager.start_background_tasks()
     yield
     # Shutdown
+    for turn in _pending_turns:
+        turn.cancel()
     await task_manager.cleanup()
     await websocket_manager.disconnect_all()
 
@@ -44,7 +51,8 @@ app = FastAPI(
     title="CAI Web API",
     description="Web API for Cybersecurity AI Framework",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
 )
 
 # CORS configuration
@@ -56,6 +64,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus scrape endpoint (only when prometheus_client is installed)
+_metrics_app = metrics_app()
+if _metrics_app is not None:
+    app.mount("/metrics", _metrics_app)
+
 
 # Health check
 @app.get("/health")
@@ -112,27 +125,50 @@ async def delete_session(session_id: str):
 
 # Message/Chat endpoints
 @app.post("/sessions/{session_id}/messages")
-async def send_message(session_id: str, message: MessageRequest):
-    """Send a message to a session and handle response"""
+async def send_message(session_id: str, message: MessageRequest, wait: bool = False):
+    """
+    Send a message to a session.
+
+    By default this returns 202 right after the agent task is queued; the
+    assistant's reply is delivered over the session WebSocket as
+    ``message_added`` events. Pass ``?wait=true`` to block until the reply is
+    ready and get it in the response body instead.
+    """
     session = session_manager.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Add user message to session
-    user_message = ChatMessage(
+    user_message = ChatMessage.model_construct(
         role="user",
         content=message.content,
         tools_used=[]
     )
     session.messages.append(user_message)
     
-    # Create and execute task with agent - wait for completion
+    # Create and execute task with agent
     task = await task_manager.create_task(
         session_id=session_id,
         message=message.content,
         agent=session.agent
     )
     
+    if wait:
+        return await _complete_chat_turn(session, task)
+    
+    turn = asyncio.create_task(_complete_chat_turn(session, task))
+    _pending_turns.add(turn)
+    turn.add_done_callback(_pending_turns.discard)
+    return JSONResponse(
+        status_code=202,
+        content={"task_id": task.id, "message_id": user_message.id}
+    )
+
+
+async def _complete_chat_turn(session: Session, task: Task) -> Dict[str, Any]:
+    """Wait for the agent task, then record and broadcast the assistant reply"""
+    session_id = session.id
+    
     # Wait for task to complete with timeout
     success = await task_manager.wait_for_task(task.id, timeout=120.0)
     
@@ -153,6 +189,9 @@ async def send_message(session_id: str, message: MessageRequest):
     else:
         content = "Agent completed but no response generated"
     
+    # Events for this turn are sent to clients as one batch frame
+    events: List[Dict[str, Any]] = []
+    
     # Get tools used from completed task
     tools_used_list = completed_task.tools_used if completed_task and completed_task.tools_used else []
     
@@ -162,7 +201,7 @@ async def send_message(session_id: str, message: MessageRequest):
         tool_commands = completed_task.metadata["tool_commands"]
         thinking_content = "\n".join(tool_commands.values())
         
-        thinking_message = ChatMessage(
+        thinking_message = ChatMessage.model_construct(
             role="assistant",
             content=thinking_content,
             tools_used=[],
@@ -170,89 +209,56 @@ async def send_message(session_id: str, message: MessageRequest):
         )
         session.messages.append(thinking_message)
         
-        # Broadcast thinking message
-        await websocket_manager.broadcast_to_session(
-            session_id,
-            {
-                "type": "message_added",
-                "message": {
-                    "id": thinking_message.id,
-                    "role": thinking_message.role,
-                    "content": thinking_message.content,
-                    "timestamp": thinking_message.timestamp.isoformat(),
-                    "tools_used": thinking_message.tools_used,
-                    "task_id": thinking_message.task_id,
-                    "is_thinking": True  # Mark as thinking message
-                }
+        # Queue thinking message
+        events.append({
+            "type": "message_added",
+            "message": {
+                **thinking_message.to_dict(),
+                "is_thinking": True  # Mark as thinking message
             }
-        )
+        })
     
     # Add main assistant response to session
-    assistant_message = ChatMessage(
+    assistant_message = ChatMessage.model_construct(
         role="assistant", 
         content=content,
-        tools_used=tools_used_list,
+        tools_used=list(tools_used_list),
         task_id=completed_task.id if completed_task and tools_used_list else None
     )
     session.messages.append(assistant_message)
     
-    # Notify WebSocket clients about new message
-    await websocket_manager.broadcast_to_session(
-        session_id,
-        {
-            "type": "message_added",
-            "message": {
-                "id": assistant_message.id,
-                "role": assistant_message.role,
-                "content": assistant_message.content,
-                "timestamp": assistant_message.timestamp.isoformat(),
-                "tools_used": assistant_message.tools_used,
-                "task_id": assistant_message.task_id
-            }
-        }
-    )
+    # Queue new message notification
+    assistant_payload: ChatMessageDict = assistant_message.to_dict()
+    events.append({
+        "type": "message_added",
+        "message": assistant_payload
+    })
     
     # Only notify about task if tools were used
     if completed_task and tools_used_list:
-        await websocket_manager.broadcast_to_session(
-            session_id,
-            {
-                "type": "task_created",
-                "task": completed_task.to_dict()
-            }
-        )
+        events.append({
+            "type": "task_created",
+            "task": completed_task.to_dict()
+        })
+    
+    # Notify WebSocket clients
+    with phase_timer(task, "broadcast"):
+        await websocket_manager.broadcast_batch(session_id, events)
     
     return {
-        "message": {
-            "id": assistant_message.id,
-            "role": assistant_message.role, 
-            "content": assistant_message.content,
-            "timestamp": assistant_message.timestamp.isoformat(),
-            "tools_used": assistant_message.tools_used,
-            "task_id": assistant_message.task_id
-        }
+        "message": assistant_payload
     }
 
 
 @app.get("/sessions/{session_id}/messages")
-async def get_session_messages(session_id: str):
-    """Get all messages in a session"""
+async def get_session_messages(session_id: str, since: Optional[datetime] = None):
+    """Get the messages in a session, optionally only those newer than `since`"""
     session = session_manager.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     return {
-        "messages": [
-            {
-                "id": msg.id,
-                "role": msg.role,
-                "content": msg.content,
-                "timestamp": msg.timestamp.isoformat(),
-                "tools_used": msg.tools_used,
-                "task_id": msg.task_id
-            }
-            for msg in session.messages
-        ]
+        "messages": [msg.to_dict() for msg in await session.messages.since_async(since)]
     }
 
 @app.get("/sessions/{session_id}/tasks", response_model=List[TaskResponse])
@@ -283,15 +289,14 @@ async def cancel_task(task_id: str):
 
 
 # Agent endpoints
-@app.get("/agents", response_model=List[AgentInfo])
-async def list_available_agents():
-    """List all available agents"""
+@functools.lru_cache(maxsize=1)
+def _agent_infos() -> List[AgentInfo]:
+    """Describe the registered agents; built once, dropped by POST /agents/reload"""
     from cai.agents import get_available_agents
     
-    available_agents = get_available_agents()
     agents = []
     
-    for agent_name, agent_instance in available_agents.items():
+    for agent_name, agent_instance in get_available_agents().items():
         # Get agent description and tools
         description = getattr(agent_instance, 'description', '')
         tools = [tool.__name__ if hasattr(tool, '__name__') else str(tool) 
@@ -308,33 +313,46 @@ async def list_available_agents():
     return agents
 
 
-@app.get("/models")
-async def list_available_models():
-    """List all available models"""
-    import os
-    
-    # Get current model from environment or use default
-    current_model = os.getenv("CAI_MODEL", "openrouter/z-ai/glm-4.5-air:free")
-    
-    # Common available models with their providers
-    models = [
-        {"id": "openrouter/z-ai/glm-4.5-air:free", "name": "GLM-4.5-Air (Free)", "provider": "openrouter"},
-        {"id": "gpt-4o", "name": "GPT-4 Optimized", "provider": "openai"},
-        {"id": "gpt-4o-mini", "name": "GPT-4o Mini", "provider": "openai"},
-        {"id": "claude-3-5-sonnet", "name": "Claude 3.5 Sonnet", "provider": "anthropic"},
-        {"id": "claude-3-5-haiku", "name": "Claude 3.5 Haiku", "provider": "anthropic"},
-        {"id": "deepseek-v3", "name": "DeepSeek V3", "provider": "deepseek"},
-        {"id": "alias0", "name": "Alias0", "provider": "alias"},
-        {"id": "qwen2.5:14b", "name": "Qwen 2.5 14B", "provider": "ollama"},
-    ]
+@app.get("/agents", response_model=List[AgentInfo])
+async def list_available_agents():
+    """List all available agents"""
+    return _agent_infos()
+
+
+@app.post("/agents/reload")
+async def reload_agents():
+    """Re-discover agents on the next session creation or /agents call"""
+    session_manager.reload_agents()
+    _agent_infos.cache_clear()
+    return {"status": "reloaded"}
+
+
+# Common available models with their providers
+AVAILABLE_MODELS = [
+    {"id": "openrouter/z-ai/glm-4.5-air:free", "name": "GLM-4.5-Air (Free)", "provider": "openrouter"},
+    {"id": "gpt-4o", "name": "GPT-4 Optimized", "provider": "openai"},
+    {"id": "gpt-4o-mini", "name": "GPT-4o Mini", "provider": "openai"},
+    {"id": "claude-3-5-sonnet", "name": "Claude 3.5 Sonnet", "provider": "anthropic"},
+    {"id": "claude-3-5-haiku", "name": "Claude 3.5 Haiku", "provider": "anthropic"},
+    {"id": "deepseek-v3", "name": "DeepSeek V3", "provider": "deepseek"},
+    {"id": "alias0", "name": "Alias0", "provider": "alias"},
+    {"id": "qwen2.5:14b", "name": "Qwen 2.5 14B", "provider": "ollama"},
+]
+_AVAILABLE_MODEL_IDS = frozenset(m["id"] for m in AVAILABLE_MODELS)
+
+
+@functools.lru_cache(maxsize=8)
+def _models_response(current_model: str) -> Dict[str, Any]:
+    """Build the /models payload for the given current model"""
+    models = AVAILABLE_MODELS
     
     # Add current model if not in list
-    if current_model not in [m["id"] for m in models]:
-        models.insert(0, {
+    if current_model not in _AVAILABLE_MODEL_IDS:
+        models = [{
             "id": current_model,
             "name": current_model.split("/")[-1] if "/" in current_model else current_model,
             "provider": "custom"
-        })
+        }] + models
     
     return {
         "models": models,
@@ -342,6 +360,13 @@ async def list_available_models():
     }
 
 
+@app.get("/models")
+async def list_available_models():
+    """List all available models"""
+    # Get current model from environment or use default
+    return _models_response(os.getenv("CAI_MODEL", "openrouter/z-ai/glm-4.5-air:free"))
+
+
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
@@ -357,7 +382,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         while True:
             # Keep connection alive and handle any incoming messages
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = loads(data)
             
             if message.get("type") == "ping":
                 await websocket.send_json({"type": "pong"})
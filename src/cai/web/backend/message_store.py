@@ -0,0 +1,114 @@
+"""
+SQLite spill store for chat messages that fall out of a session's in-memory tail
+
+Every statement runs on one writer thread, so the event loop never blocks on
+SQLite and reads always see the writes queued before them.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+# An empty filename gives SQLite a private on-disk temporary database that is
+# removed when the connection closes; sessions only live as long as the process.
+HISTORY_DB = os.getenv("CAI_WEB_HISTORY_DB", "")
+
+_conn: Optional[sqlite3.Connection] = None
+_writer: Optional[ThreadPoolExecutor] = None
+
+
+def _connection() -> sqlite3.Connection:
+    """Open the spill database on first use (on the writer thread)"""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(HISTORY_DB, check_same_thread=False)
+        # The spill is a cache of in-process state: durability across crashes is not needed
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, ts REAL NOT NULL, payload TEXT NOT NULL)"
+        )
+        _conn.execute(
+            "CREATE INDEX IF NOT EXISTS messages_session_ts "
+            "ON messages (session_id, ts)"
+        )
+    return _conn
+
+
+def _get_writer() -> ThreadPoolExecutor:
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cai-history")
+    return _writer
+
+
+def _log_failure(future: Future):
+    if future.exception() is not None:
+        logging.warning(f"Message spill store error: {future.exception()!r}")
+
+
+def _spill(session_id: str, ts: float, payload: str):
+    conn = _connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO messages (session_id, ts, payload) VALUES (?, ?, ?)",
+            (session_id, ts, payload)
+        )
+
+
+def _load(session_id: str, since: Optional[float], decode: Optional[Callable]) -> list:
+    conn = _connection()
+    if since is None:
+        rows = conn.execute(
+            "SELECT payload FROM messages WHERE session_id = ? ORDER BY ts, rowid",
+            (session_id,)
+        )
+    else:
+        rows = conn.execute(
+            "SELECT payload FROM messages WHERE session_id = ? AND ts > ? "
+            "ORDER BY ts, rowid",
+            (session_id, since)
+        )
+    if decode is None:
+        return [payload for (payload,) in rows]
+    return [decode(payload) for (payload,) in rows]
+
+
+def _purge(session_id: str):
+    conn = _connection()
+    with conn:
+        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+
+def spill(session_id: str, ts: float, payload: str):
+    """Queue one serialized message for storage"""
+    _get_writer().submit(_spill, session_id, ts, payload).add_done_callback(_log_failure)
+
+
+def load(
+    session_id: str,
+    since: Optional[float] = None,
+    decode: Optional[Callable] = None
+) -> List:
+    """
+    Return serialized messages for a session, oldest first, newer than `since`.
+    `decode` is applied to each payload on the writer thread.
+    """
+    return _get_writer().submit(_load, session_id, since, decode).result()
+
+
+async def load_async(
+    session_id: str,
+    since: Optional[float] = None,
+    decode: Optional[Callable] = None
+) -> List:
+    """Like load(), without blocking the event loop"""
+    return await asyncio.wrap_future(_get_writer().submit(_load, session_id, since, decode))
+
+
+def purge(session_id: str):
+    """Queue the removal of every spilled message of a session"""
+    _get_writer().submit(_purge, session_id).add_done_callback(_log_failure)
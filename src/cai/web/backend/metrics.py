@@ -0,0 +1,49 @@
+"""
+Per-phase latency metrics for CAI Web Backend tasks
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from .models import Task
+
+try:
+    from prometheus_client import Histogram, make_asgi_app
+except ImportError:  # optional, phase latencies are still kept on the task
+    Histogram = None
+    make_asgi_app = None
+
+
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+_phase_histogram = (
+    Histogram(
+        "cai_tool_phase_seconds",
+        "Latency of CAI web task phases",
+        ["phase"],
+        buckets=PHASE_BUCKETS
+    )
+    if Histogram is not None else None
+)
+
+
+def metrics_app():
+    """ASGI app exposing the Prometheus registry, or None without prometheus_client"""
+    return make_asgi_app() if make_asgi_app is not None else None
+
+
+def record_phase(task: Task, phase: str, seconds: float):
+    """Store a phase latency on the task and in the histogram"""
+    task.metadata.setdefault("phase_latencies", {})[phase] = seconds
+    if _phase_histogram is not None:
+        _phase_histogram.labels(phase=phase).observe(seconds)
+
+
+@contextmanager
+def phase_timer(task: Task, phase: str) -> Iterator[None]:
+    """Time the enclosed block as `phase` of the task"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(task, phase, time.perf_counter() - start)
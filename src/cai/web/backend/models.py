@@ -1,12 +1,22 @@
 """
 Data models for CAI Web Backend
 """
-from datetime import datetime
+import asyncio
+import os
+import time
+from collections import deque
+from functools import cached_property
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from typing import Deque, Dict, Iterator, List, Optional, Any, TypedDict
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_serializer
 import uuid
 
+from . import message_store
+
+# Messages kept in memory per session (at least one); older ones are spilled to SQLite
+HOT_MESSAGES = max(1, int(os.getenv("CAI_WEB_HOT_MESSAGES", "200")))
+
 
 class TaskStatus(str, Enum):
     """Task status enumeration"""
@@ -41,17 +51,124 @@ class SessionCreate(BaseModel):
     config: Optional[Dict[str, Any]] = Field(default_factory=dict)
 
 
+def _iso_from_ts(ts: float) -> str:
+    """Naive-UTC ISO string for a Unix timestamp (the format utcnow().isoformat() gives)"""
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def _ts_from_datetime(value: datetime) -> float:
+    """Unix timestamp for a datetime, reading naive values as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class ChatMessageDict(TypedDict):
+    """JSON shape of a chat message as sent to clients"""
+    id: str
+    role: str
+    content: str
+    timestamp: str
+    tools_used: List[str]
+    task_id: Optional[str]
+
+
 class ChatMessage(BaseModel):
-    """Chat message in a session"""
+    """Chat message in a session
+    
+    Messages built by the backend itself use model_construct() and skip
+    validation; their fields are already of the right type.
+    """
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     role: str  # 'user' or 'assistant'
     content: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    created_ts: float = Field(default_factory=time.time)
     tools_used: List[str] = Field(default_factory=list)
     task_id: Optional[str] = None  # Link to task if tools were used
+    
+    @cached_property
+    def timestamp(self) -> str:
+        """ISO creation time, formatted on first use"""
+        return _iso_from_ts(self.created_ts)
+    
+    def to_dict(self) -> ChatMessageDict:
+        """Convert message to a JSON-ready dictionary (serialized by pydantic-core)"""
+        data = self.model_dump(mode="json", exclude={"created_ts"})
+        data["timestamp"] = self.timestamp
+        return data
+
+
+class MessageHistory:
+    """Session chat history: a bounded in-memory tail backed by a SQLite spill"""
+    
+    def __init__(self, session_id: str, maxlen: int = HOT_MESSAGES):
+        self.session_id = session_id
+        self._tail: Deque[ChatMessage] = deque(maxlen=max(1, maxlen))
+        self._spilled = 0
+        self._closed = False
+    
+    def append(self, message: ChatMessage):
+        """Add a message, spilling the oldest in-memory one if the tail is full"""
+        if self._closed:
+            # Late reply of a turn whose session is already gone
+            return
+        if len(self._tail) == self._tail.maxlen:
+            oldest = self._tail[0]
+            message_store.spill(
+                self.session_id, oldest.created_ts, oldest.model_dump_json()
+            )
+            self._spilled += 1
+        self._tail.append(message)
+    
+    def _split(self, since: Optional[datetime]):
+        key = _ts_from_datetime(since) if since is not None else None
+        tail = list(self._tail)
+        if key is not None:
+            tail = [m for m in tail if m.created_ts > key]
+        # Only touch the spill when the requested range reaches past the tail
+        reaches_spill = bool(self._spilled) and (key is None or len(tail) == len(self._tail))
+        return key, tail, reaches_spill
+    
+    def since(self, since: Optional[datetime] = None) -> List[ChatMessage]:
+        """Messages newer than `since` (all messages when None), oldest first"""
+        key, tail, reaches_spill = self._split(since)
+        if reaches_spill:
+            return message_store.load(self.session_id, key, ChatMessage.model_validate_json) + tail
+        return tail
+    
+    async def since_async(self, since: Optional[datetime] = None) -> List[ChatMessage]:
+        """Like since(), loading and parsing spilled messages off the event loop"""
+        key, tail, reaches_spill = self._split(since)
+        if reaches_spill:
+            older = await message_store.load_async(
+                self.session_id, key, ChatMessage.model_validate_json
+            )
+            return older + tail
+        return tail
+    
+    def clear(self):
+        """Drop the whole history, including spilled messages"""
+        self._tail.clear()
+        if self._spilled:
+            message_store.purge(self.session_id)
+            self._spilled = 0
+    
+    def close(self):
+        """Clear the history for good; later appends are dropped, not spilled"""
+        self.clear()
+        self._closed = True
+    
+    def __iter__(self) -> Iterator[ChatMessage]:
+        return iter(self.since())
+    
+    def __len__(self) -> int:
+        return self._spilled + len(self._tail)
+
 
 class Session(BaseModel):
     """Session model"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     agent_type: str
@@ -61,34 +178,37 @@ class Session(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     config: Dict[str, Any] = Field(default_factory=dict)
     agent: Optional[Any] = None  # Will hold the actual CAI agent instance
-    messages: List[ChatMessage] = Field(default_factory=list)
+    _messages: MessageHistory = PrivateAttr()
     
-    class Config:
-        arbitrary_types_allowed = True
+    def model_post_init(self, __context: Any):
+        self._messages = MessageHistory(self.id)
+    
+    @property
+    def messages(self) -> MessageHistory:
+        """Chat history of this session"""
+        return self._messages
 
 
 class SessionResponse(BaseModel):
     """Response model for session data"""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: str
     name: str
     agent_type: str
     model: str
     status: str
-    created_at: str
-    updated_at: str
+    created_at: datetime
+    updated_at: datetime
     task_count: int = 0
     
+    @field_serializer("created_at", "updated_at")
+    def _serialize_datetime(self, value: datetime) -> str:
+        return value.isoformat()
+    
     @classmethod
     def from_session(cls, session: Session) -> "SessionResponse":
-        return cls(
-            id=session.id,
-            name=session.name,
-            agent_type=session.agent_type,
-            model=session.model,
-            status=session.status,
-            created_at=session.created_at.isoformat(),
-            updated_at=session.updated_at.isoformat()
-        )
+        return cls.model_validate(session)
 
 
 class MessageRequest(BaseModel):
@@ -103,7 +223,7 @@ class Task(BaseModel):
     session_id: str
     message: str
     status: TaskStatus = TaskStatus.PENDING
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_ts: float = Field(default_factory=time.time)
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     result: Optional[Any] = None
@@ -112,6 +232,22 @@ class Task(BaseModel):
     tools_used: List[str] = Field(default_factory=list)
     token_usage: Dict[str, int] = Field(default_factory=dict)
     metadata: Dict[str, Any] = Field(default_factory=dict)  # Store additional task data
+    # Resolved with the task itself once it reaches a terminal state
+    _done: Optional[asyncio.Future] = PrivateAttr(default=None)
+    # Set when a waiter gives up on the task, so its cancellation reads as a failure
+    _timeout_error: Optional[str] = PrivateAttr(default=None)
+    
+    @cached_property
+    def created_at(self) -> str:
+        """ISO creation time, formatted on first use"""
+        return _iso_from_ts(self.created_ts)
+    
+    @property
+    def duration(self) -> Optional[float]:
+        """Seconds between start and completion, if both happened"""
+        if self.started_at and self.completed_at:
+            return (self.completed_at - self.started_at).total_seconds()
+        return None
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert task to dictionary"""
@@ -120,7 +256,7 @@ class Task(BaseModel):
             "session_id": self.session_id,
             "message": self.message,
             "status": self.status,
-            "created_at": self.created_at.isoformat(),
+            "created_at": self.created_at,
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
             "result": self.result,
@@ -134,37 +270,27 @@ class Task(BaseModel):
 
 class TaskResponse(BaseModel):
     """Response model for task data"""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: str
     session_id: str
     message: str
     status: str
     created_at: str
-    started_at: Optional[str] = None
-    completed_at: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
     result: Optional[Any] = None
     error: Optional[str] = None
     tools_used: List[str] = Field(default_factory=list)
     duration: Optional[float] = None
     
+    @field_serializer("started_at", "completed_at")
+    def _serialize_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
+    
     @classmethod
     def from_task(cls, task: Task) -> "TaskResponse":
-        duration = None
-        if task.started_at and task.completed_at:
-            duration = (task.completed_at - task.started_at).total_seconds()
-        
-        return cls(
-            id=task.id,
-            session_id=task.session_id,
-            message=task.message,
-            status=task.status,
-            created_at=task.created_at.isoformat(),
-            started_at=task.started_at.isoformat() if task.started_at else None,
-            completed_at=task.completed_at.isoformat() if task.completed_at else None,
-            result=task.result,
-            error=task.error,
-            tools_used=task.tools_used,
-            duration=duration
-        )
+        return cls.model_validate(task)
 
 
 class WebSocketMessage(BaseModel):
@@ -1,21 +1,59 @@
 """
 Session Manager for CAI Web Backend
 """
-import asyncio
+import functools
+import os
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 
+from .lru import LRUDict
 from .models import Session, SessionStatus
+from .task_manager import TaskManager
+from .websocket_manager import websocket_manager
 from ...sdk.agents import Agent
 from ...agents import get_agent_by_name, get_available_agents
+from ...agents import factory as agent_factory
+
+# Sessions kept in memory; the least recently used is dropped past the cap
+SESSION_CACHE_SIZE = int(os.getenv("CAI_SESSION_CACHE_SIZE", "1024"))
+
+
+@functools.lru_cache(maxsize=32)
+def _agent_factory(agent_type: str, model: str) -> Callable[..., Agent]:
+    """Resolve how to build `agent_type` on `model` once; each call makes a new agent
+    
+    The per-session agent_id is passed at call time, so it is not part of the key.
+    """
+    try:
+        factory = agent_factory.get_agent_factory(agent_type)
+    except ValueError:
+        # Not a factory agent: keep get_agent_by_name's legacy lookup (and its errors)
+        return functools.partial(get_agent_by_name, agent_name=agent_type, model_override=model)
+    return functools.partial(factory, model_override=model)
+
+
+def _drop_session(session_id: str, session: Session):
+    """Release an evicted session"""
+    session.status = SessionStatus.TERMINATED
+    session.messages.close()
 
 
 class SessionManager:
     """Manages CAI sessions"""
     
-    def __init__(self):
-        self.sessions: Dict[str, Session] = {}
-        self._lock = asyncio.Lock()
+    def __init__(self, task_manager: Optional[TaskManager] = None):
+        self._task_manager = task_manager
+        self.sessions: Dict[str, Session] = LRUDict(
+            SESSION_CACHE_SIZE,
+            evictable=self._is_idle,
+            on_evict=_drop_session
+        )
+    
+    def _is_idle(self, session: Session) -> bool:
+        """Only idle sessions are evicted; one with a live task or open UI is kept"""
+        if self._task_manager is not None and self._task_manager.has_active_tasks(session.id):
+            return False
+        return not websocket_manager.has_subscribers(session.id)
     
     async def create_session(
         self,
@@ -25,21 +63,20 @@ class SessionManager:
         config: Optional[Dict[str, Any]] = None
     ) -> Session:
         """Create a new CAI session with an agent"""
-        async with self._lock:
-            # Create the agent based on type
-            agent = self._create_agent(agent_type, model, config or {})
-            
-            # Create session
-            session = Session(
-                name=name,
-                agent_type=agent_type,
-                model=model,
-                config=config or {},
-                agent=agent
-            )
-            
-            self.sessions[session.id] = session
-            return session
+        # Create the agent based on type
+        agent = self._create_agent(agent_type, model, config or {})
+        
+        # Create session
+        session = Session(
+            name=name,
+            agent_type=agent_type,
+            model=model,
+            config=config or {},
+            agent=agent
+        )
+        
+        self.sessions[session.id] = session
+        return session
     
     def _create_agent(
         self,
@@ -48,26 +85,12 @@ class SessionManager:
         config: Dict[str, Any]
     ) -> Agent:
         """Create a CAI agent instance"""
-        import os
-        
         try:
-            # Set the model as environment variable for the agent creation
-            original_model = os.environ.get("CAI_MODEL")
-            os.environ["CAI_MODEL"] = model
-            
-            try:
-                # Use the agent factory system to create a new agent instance
-                agent = get_agent_by_name(
-                    agent_name=agent_type,
-                    model_override=model,
-                    agent_id=f"web-{agent_type}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
-                )
-            finally:
-                # Restore original model environment variable
-                if original_model is not None:
-                    os.environ["CAI_MODEL"] = original_model
-                elif "CAI_MODEL" in os.environ:
-                    del os.environ["CAI_MODEL"]
+            # Use the agent factory system to create a new agent instance;
+            # model_override takes precedence over CAI_MODEL in the factory
+            agent = _agent_factory(agent_type, model)(
+                agent_id=f"web-{agent_type}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+            )
             
             # Apply custom configuration if provided
             if hasattr(agent, 'model') and agent.model:
@@ -93,23 +116,29 @@ class SessionManager:
                 f"Available agents: {', '.join(available_agents.keys())}"
             ) from e
     
+    def reload_agents(self):
+        """Forget discovered agent factories so new/changed agents are picked up"""
+        agent_factory.AGENT_FACTORIES = None
+        _agent_factory.cache_clear()
+    
     def get_session(self, session_id: str) -> Optional[Session]:
         """Get a session by ID"""
         return self.sessions.get(session_id)
     
     def get_all_sessions(self) -> List[Session]:
-        """Get all active sessions"""
-        return list(self.sessions.values())
+        """Get all active sessions, oldest first"""
+        # Store order is recency of use, not creation
+        return sorted(self.sessions.values(), key=lambda session: session.created_at)
     
     async def delete_session(self, session_id: str) -> bool:
         """Delete a session"""
-        async with self._lock:
-            if session_id in self.sessions:
-                session = self.sessions[session_id]
-                session.status = SessionStatus.TERMINATED
-                del self.sessions[session_id]
-                return True
-            return False
+        if session_id in self.sessions:
+            session = self.sessions[session_id]
+            session.status = SessionStatus.TERMINATED
+            session.messages.close()
+            del self.sessions[session_id]
+            return True
+        return False
     
     async def update_session_activity(self, session_id: str):
         """Update session last activity timestamp"""
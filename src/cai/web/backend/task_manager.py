@@ -2,25 +2,245 @@
 Task Manager for CAI Web Backend
 """
 import asyncio
-from datetime import datetime
-from typing import Dict, List, Optional, Any, Callable
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from weakref import WeakValueDictionary
+from datetime import datetime, timedelta
+from typing import Awaitable, Deque, Dict, List, Optional, Any, Callable, Set, Tuple
 import traceback
 import json
 
+from .lru import LRUDict
 from .models import Task, TaskStatus
+from .metrics import phase_timer, record_phase
 from ...sdk.agents import Agent
 from ...sdk.agents.run import Runner
 from .websocket_manager import websocket_manager
 
+logger = logging.getLogger(__name__)
+
+# Tasks kept for lookup; only finished tasks are evicted once the cap is hit
+TASK_CACHE_SIZE = int(os.getenv("CAI_TASK_CACHE_SIZE", "1024"))
+_FINISHED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+# Finished tasks are also dropped this long after completion (checked every minute)
+TASK_TTL_MINUTES = float(os.getenv("CAI_TASK_TTL_MIN", "60"))
+_REAP_INTERVAL = 60
+
+# Tasks beyond these caps wait (still PENDING) for a slot before running
+MAX_CONCURRENT_TASKS = int(os.getenv("CAI_MAX_CONCURRENT_TASKS", "32"))
+MAX_TASKS_PER_SESSION = int(os.getenv("CAI_MAX_TASKS_PER_SESSION", "4"))
+
+# Opt-in: run each agent on a worker thread (with its own event loop) for agents
+# whose tools block; LLM I/O otherwise stays on the server loop.
+# Worker loops live as long as the process and every session is pinned to one
+# of them, so model clients bound to a loop (litellm, httpx) stay usable across
+# turns. A session gets at most one thread run at a time: a turn that starts
+# while the previous one is still unwinding on its loop (e.g. after a chat
+# timeout cancelled it) fails instead of sharing the agent.
+RUN_IN_EXECUTOR = os.getenv("CAI_RUN_IN_EXECUTOR") == "1"
+WORKER_POOL_SIZE = max(1, int(os.getenv("CAI_WORKER_POOL_SIZE", str(min(32, os.cpu_count() or 1)))))
+
+
+class _WorkerLoop:
+    """A daemon thread running one event loop until stop()"""
+    
+    def __init__(self, name: str):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def submit(self, make_coro: Callable[[], Awaitable]) -> Tuple[Future, Future]:
+        """
+        Run make_coro() on this loop. Returns (result, finished): cancelling
+        `result` cancels the run, and `finished` resolves only once the
+        coroutine has really ended (or was cancelled before it started).
+        """
+        result: Future = Future()
+        finished: Future = Future()
+        
+        def settle(run: "asyncio.Task"):
+            try:
+                if run.cancelled():
+                    result.cancel()
+                elif run.exception() is not None:
+                    result.set_exception(run.exception())
+                else:
+                    result.set_result(run.result())
+            except InvalidStateError:
+                pass  # The caller cancelled first
+            finished.set_result(None)
+        
+        def start():
+            if result.cancelled():
+                finished.set_result(None)
+                return
+            run = self.loop.create_task(make_coro())
+            run.add_done_callback(settle)
+            result.add_done_callback(
+                lambda f: f.cancelled() and self.loop.call_soon_threadsafe(run.cancel)
+            )
+        
+        self.loop.call_soon_threadsafe(start)
+        return result, finished
+    
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_worker_loops: Dict[int, _WorkerLoop] = {}
+
+
+def _get_worker_loop(session_id: str) -> _WorkerLoop:
+    """The worker loop a session's runs are pinned to (started on first use)"""
+    slot = hash(session_id) % WORKER_POOL_SIZE
+    worker = _worker_loops.get(slot)
+    if worker is None:
+        worker = _worker_loops[slot] = _WorkerLoop(f"cai-run_{slot}")
+    return worker
+
+
+def _stop_worker_loops():
+    for worker in _worker_loops.values():
+        worker.stop()
+    _worker_loops.clear()
+
+
+def _error_location(exc: BaseException) -> Dict[str, Any]:
+    """File and line where `exc` was raised (innermost frame), without formatting a traceback"""
+    tb = exc.__traceback__
+    if tb is None:
+        return {"file": None, "lineno": None}
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    return {"file": tb.tb_frame.f_code.co_filename, "lineno": tb.tb_lineno}
+
+
+# Attach formatted tracebacks to failed tasks' logs (debugging aid)
+INCLUDE_TRACEBACK = os.getenv("CAI_INCLUDE_TRACEBACK", "0") == "1"
+
+# Tool outputs kept per task (each already truncated to 2000 chars)
+MAX_TOOL_OUTPUTS = int(os.getenv("CAI_MAX_TOOL_OUTPUTS", "64"))
+
+# Shared decoder for tool-call arguments
+_JSON_DECODER = json.JSONDecoder()
+# getattr default for attributes whose value may legitimately be None
+_MISSING = object()
+
+
+@dataclass
+class _RunSummary:
+    """What _summarize_result collects from a run's new_items"""
+    initial_message: str = ""  # First thinking message
+    final_message: str = ""    # Final response after tools
+    tools_used: List[str] = field(default_factory=list)  # Unique, first-seen order
+    tools_seen: Set[str] = field(default_factory=set)
+    tool_commands: Dict[str, str] = field(default_factory=dict)  # For thinking display
+    # For detailed task view; only the most recent MAX_TOOL_OUTPUTS are kept
+    tool_outputs: Deque[str] = field(default_factory=lambda: deque(maxlen=MAX_TOOL_OUTPUTS))
+
+
+def _on_tool_call(summary: _RunSummary, item: Any):
+    """Record the tool name and command of a ToolCallItem"""
+    tool_args = None
+    raw_item = getattr(item, 'raw_item', None)
+    
+    # Try multiple ways to extract tool name and args
+    tool_name = getattr(item, 'tool_name', None)
+    if not tool_name:
+        tool_calls = getattr(raw_item, 'tool_calls', None)
+        if tool_calls:
+            # Extract from raw OpenAI tool call
+            function = tool_calls[0].function
+            tool_name = function.name
+            try:
+                tool_args = _JSON_DECODER.decode(function.arguments)
+            except:
+                tool_args = function.arguments
+        else:
+            tool_name = getattr(raw_item, 'name', None)
+    
+    if tool_name:
+        if tool_name not in summary.tools_seen:
+            summary.tools_seen.add(tool_name)
+            summary.tools_used.append(tool_name)
+        # Store command for thinking display
+        if tool_args:
+            if tool_name == 'generic_linux_command' and 'command' in tool_args:
+                summary.tool_commands[tool_name] = f"Executing Command: {tool_args['command']}"
+            else:
+                summary.tool_commands[tool_name] = f"Executing {tool_name}: {str(tool_args)[:100]}"
+        else:
+            summary.tool_commands[tool_name] = f"Executing {tool_name}"
+
+
+def _on_tool_output(summary: _RunSummary, item: Any):
+    """Keep a ToolCallOutputItem's output for the task details"""
+    output = getattr(item, 'output', _MISSING)
+    if output is not _MISSING:
+        summary.tool_outputs.append(str(output)[:2000])  # Limit size
+
+
+def _on_message(summary: _RunSummary, item: Any):
+    """Take the text of a MessageOutputItem as thinking or final response"""
+    # Extract text from content array
+    content_items = getattr(getattr(item, 'raw_item', None), 'content', None)
+    if content_items:
+        content_item = content_items[0]
+        message_text = getattr(content_item, 'text', _MISSING)
+        if message_text is _MISSING:
+            message_text = getattr(content_item, 'content', _MISSING)
+        if message_text is _MISSING:
+            message_text = str(content_item)
+        
+        # First message = initial thinking, last message = final response
+        if not summary.initial_message and message_text:
+            summary.initial_message = message_text
+        elif message_text and message_text != summary.initial_message:
+            summary.final_message = message_text
+
+
+# RunItem.type -> handler; other item types (handoffs, reasoning) are ignored
+_TYPE_HANDLERS: Dict[str, Callable[[_RunSummary, Any], None]] = {
+    "tool_call_item": _on_tool_call,
+    "tool_call_output_item": _on_tool_output,
+    "message_output_item": _on_message,
+}
+
 
 class TaskManager:
     """Manages CAI agent tasks with parallel execution support"""
     
     def __init__(self):
-        self.tasks: Dict[str, Task] = {}
+        self.tasks: Dict[str, Task] = LRUDict(
+            TASK_CACHE_SIZE,
+            evictable=lambda task: task.status in _FINISHED_STATUSES
+        )
         self.running_tasks: Dict[str, asyncio.Task] = {}
-        self._lock = asyncio.Lock()
+        # Unfinished (pending or running) tasks per session
+        self._active_per_session: Dict[str, int] = {}
         self._background_tasks: List[asyncio.Task] = []
+        # Created on first use so they bind to the server's running loop (3.9)
+        self._global_sem: Optional[asyncio.Semaphore] = None
+        # Live worker-loop runs (RUN_IN_EXECUTOR) by session; a cancelled
+        # run stays here until its coroutine has really finished
+        self._thread_runs: Dict[str, Future] = {}
+        # Per-session caps, dropped once no task of the session holds a reference
+        self._session_sems: "WeakValueDictionary[str, asyncio.Semaphore]" = WeakValueDictionary()
+        # Post-processing of finished runs; agents and run results stay in-process
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(os.cpu_count() or 1, 4),
+            thread_name_prefix="cai-task"
+        )
     
     async def create_task(
         self,
@@ -29,137 +249,102 @@ class TaskManager:
         agent: Agent
     ) -> Task:
         """Create and start a new task"""
-        async with self._lock:
-            # Create task
-            task = Task(
-                session_id=session_id,
-                message=message
-            )
-            self.tasks[task.id] = task
-            
-            # Start task execution
-            asyncio_task = asyncio.create_task(
-                self._execute_task(task, agent)
-            )
-            self.running_tasks[task.id] = asyncio_task
-            
-            return task
+        # Create task
+        task = Task(
+            session_id=session_id,
+            message=message
+        )
+        self.tasks[task.id] = task
+        task._done = asyncio.get_running_loop().create_future()
+        
+        # Start task execution
+        asyncio_task = asyncio.create_task(
+            self._execute_task(task, agent)
+        )
+        self.running_tasks[task.id] = asyncio_task
+        self._active_per_session[session_id] = self._active_per_session.get(session_id, 0) + 1
+        # Also fires if the task is cancelled before it ever starts running
+        asyncio_task.add_done_callback(lambda _: self._task_done(task))
+        
+        return task
+    
+    def _task_done(self, task: Task):
+        active = self._active_per_session.get(task.session_id, 0) - 1
+        if active > 0:
+            self._active_per_session[task.session_id] = active
+        else:
+            self._active_per_session.pop(task.session_id, None)
+        self._resolve_done(task)
+    
+    def has_active_tasks(self, session_id: str) -> bool:
+        """Whether the session has a task that is still pending or running"""
+        return session_id in self._active_per_session
+    
+    @staticmethod
+    def _resolve_done(task: Task):
+        """Wake up anyone waiting on the task"""
+        if task._done is not None and not task._done.done():
+            task._done.set_result(task)
+    
+    def _global_semaphore(self) -> asyncio.Semaphore:
+        if self._global_sem is None:
+            self._global_sem = asyncio.Semaphore(MAX_CONCURRENT_TASKS)
+        return self._global_sem
+    
+    def _session_semaphore(self, session_id: str) -> asyncio.Semaphore:
+        sem = self._session_sems.get(session_id)
+        if sem is None:
+            sem = self._session_sems[session_id] = asyncio.Semaphore(MAX_TASKS_PER_SESSION)
+        return sem
     
     async def _execute_task(self, task: Task, agent: Agent):
         """Execute a task with the given agent - simplified like CLI"""
+        session_sem = self._session_semaphore(task.session_id)
+        global_sem = self._global_semaphore()
+        acquired: List[asyncio.Semaphore] = []
         try:
+            # Wait for a per-session slot, then a global one; the other way
+            # round a session's own backlog could hold every global slot
+            await session_sem.acquire()
+            acquired.append(session_sem)
+            await global_sem.acquire()
+            acquired.append(global_sem)
+            
             # Update task status
+            record_phase(task, "queue", time.time() - task.created_ts)
             task.status = TaskStatus.RUNNING
             task.started_at = datetime.utcnow()
             await self._notify_task_update(task)
             
             # Run the agent like CLI does - simple and clean
-            result = await Runner.run(
-                starting_agent=agent,
-                input=task.message
-            )
-            
-            # Extract messages and tools used from result (like CLI)
-            initial_message = ""  # First thinking message 
-            final_message = ""    # Final response after tools
-            tools_used = []
-            tool_commands = {}    # Store tool commands for thinking display
-            tool_outputs = {}     # Store tool outputs for detailed task view
-            
-            # Process new_items to extract response and tool usage
-            if hasattr(result, 'new_items') and result.new_items:
-                for idx, item in enumerate(result.new_items):
-                    # Extract tool usage from ToolCallItem or ToolCallOutputItem
-                    if hasattr(item, 'type'):
-                        item_type_str = str(item.type).lower()
-                        
-                        # Check for tool call items
-                        if 'tool_call' in item_type_str:
-                            tool_name = None
-                            tool_args = None
-                            
-                            # Try multiple ways to extract tool name and args
-                            if hasattr(item, 'tool_name') and item.tool_name:
-                                tool_name = item.tool_name
-                            elif hasattr(item, 'raw_item') and hasattr(item.raw_item, 'tool_calls'):
-                                # Extract from raw OpenAI tool call
-                                tool_calls = item.raw_item.tool_calls
-                                if tool_calls and len(tool_calls) > 0:
-                                    tool_name = tool_calls[0].function.name
-                                    try:
-                                        import json
-                                        tool_args = json.loads(tool_calls[0].function.arguments)
-                                    except:
-                                        tool_args = tool_calls[0].function.arguments
-                            elif hasattr(item, 'raw_item') and hasattr(item.raw_item, 'name'):
-                                tool_name = item.raw_item.name
-                            
-                            if tool_name:
-                                tools_used.append(tool_name)
-                                # Store command for thinking display
-                                if tool_args:
-                                    if tool_name == 'generic_linux_command' and 'command' in tool_args:
-                                        tool_commands[tool_name] = f"Executing Command: {tool_args['command']}"
-                                    else:
-                                        tool_commands[tool_name] = f"Executing {tool_name}: {str(tool_args)[:100]}"
-                                else:
-                                    tool_commands[tool_name] = f"Executing {tool_name}"
-                        
-                        # Extract assistant messages from MessageOutputItem  
-                        elif 'message_output' in item_type_str or 'message' in item_type_str:
-                            if hasattr(item, 'raw_item') and hasattr(item.raw_item, 'content'):
-                                # Extract text from content array
-                                content_items = item.raw_item.content
-                                if content_items and len(content_items) > 0:
-                                    content_item = content_items[0]
-                                    message_text = ""
-                                    if hasattr(content_item, 'text'):
-                                        message_text = content_item.text
-                                    elif hasattr(content_item, 'content'):
-                                        message_text = content_item.content
-                                    else:
-                                        message_text = str(content_item)
-                                    
-                                    # First message = initial thinking, last message = final response
-                                    if not initial_message and message_text:
-                                        initial_message = message_text
-                                    elif message_text and message_text != initial_message:
-                                        final_message = message_text
-                        
-                        # Extract tool output for detailed task view
-                        elif 'tool_call_output' in item_type_str:
-                            if hasattr(item, 'output'):
-                                # Store output for the task details
-                                tool_outputs[len(tool_outputs)] = str(item.output)[:2000]  # Limit size
-            
-            # Remove duplicates from tools_used  
-            tools_used = list(set(tools_used))
-            
-            # For task result, prioritize tool outputs over AI messages
-            task_result = ""
-            
-            # Use tool outputs as primary task result 
-            if tool_outputs:
-                # Combine all tool outputs
-                tool_output_texts = []
-                for output in tool_outputs.values():
-                    tool_output_texts.append(str(output))
-                task_result = "\n\n".join(tool_output_texts)
-            elif tools_used:
-                task_result = f"Executed tools: {', '.join(tools_used)}"
-            else:
-                # Fallback to AI response if no tools were used
-                assistant_message = final_message if final_message else initial_message
-                if assistant_message:
-                    task_result = assistant_message
+            with phase_timer(task, "agent"):
+                if RUN_IN_EXECUTOR:
+                    result = await asyncio.wrap_future(
+                        self._start_thread_run(task.session_id, agent, task.message)
+                    )
                 else:
-                    task_result = "Task completed"
+                    result = await Runner.run(
+                        starting_agent=agent,
+                        input=task.message
+                    )
+            
+            # Walk the run items off the event loop so other clients stay responsive
+            summary = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._summarize_result, result
+            )
+            initial_message = summary["initial_message"]
+            final_message = summary["final_message"]
+            tools_used = summary["tools_used"]
+            tool_commands = summary["tool_commands"]
+            tool_outputs = summary["tool_outputs"]
+            task_result = summary["task_result"]
             
             # Set task result 
             task.result = task_result
                 
             # Store additional metadata for task details
             task.metadata = {
+                **task.metadata,  # keeps phase_latencies
                 "initial_thinking": initial_message if initial_message else None,
                 "final_response": final_message if final_message else None,
                 "tool_commands": tool_commands,
@@ -171,12 +356,13 @@ class TaskManager:
             task.completed_at = datetime.utcnow()
             task.tools_used = tools_used
             
-            # Simple logs for tools used
+            # Simple logs for tools used, all stamped with the completion time
+            now_iso = task.completed_at.isoformat()
             task.logs = [
                 {
                     "type": "tool_executed",
                     "tool": tool_name,
-                    "timestamp": datetime.utcnow().isoformat()
+                    "timestamp": now_iso
                 }
                 for tool_name in tools_used
             ]
@@ -201,32 +387,119 @@ class TaskManager:
                     }
             
         except asyncio.CancelledError:
-            task.status = TaskStatus.CANCELLED
-            task.error = "Task was cancelled"
+            if task._timeout_error is not None:
+                # Cancelled by wait_for_task giving up, not by the user
+                task.status = TaskStatus.FAILED
+                task.error = task._timeout_error
+                task.completed_at = datetime.utcnow()
+            else:
+                task.status = TaskStatus.CANCELLED
+                task.error = "Task was cancelled"
             raise
         except Exception as e:
             task.status = TaskStatus.FAILED
             task.error = str(e)
+            task.completed_at = datetime.utcnow()
+            # The traceback is only formatted for the server log at debug level;
+            # task payloads (sent to every UI) carry it only when requested
+            logger.error(
+                "Task %s failed: %s: %s", task.id, type(e).__name__, e,
+                exc_info=logger.isEnabledFor(logging.DEBUG)
+            )
             task.logs.append({
+                **_error_location(e),
                 "type": "error",
+                "error_class": type(e).__name__,
                 "error": str(e),
-                "traceback": traceback.format_exc(),
-                "timestamp": datetime.utcnow().isoformat()
+                "traceback": traceback.format_exc() if INCLUDE_TRACEBACK else None,
+                "timestamp": task.completed_at.isoformat()
             })
         finally:
-            # Clean up
-            task.completed_at = datetime.utcnow()
+            for sem in reversed(acquired):
+                sem.release()
+            
+            # Clean up; success/error paths (or a timeout) already stamped the time
+            if task.completed_at is None:
+                task.completed_at = datetime.utcnow()
             if task.id in self.running_tasks:
                 del self.running_tasks[task.id]
             
             # Notify completion
             await self._notify_task_update(task)
     
+    def _start_thread_run(self, session_id: str, agent: Agent, message: str) -> Future:
+        """Run the session's agent on its worker loop, one run per session at a time"""
+        previous = self._thread_runs.get(session_id)
+        if previous is not None and not previous.done():
+            raise RuntimeError(
+                "The previous turn of this session is still running; try again once it finishes"
+            )
+        future, finished = _get_worker_loop(session_id).submit(
+            lambda: Runner.run(starting_agent=agent, input=message)
+        )
+        # A cancelled run future is done at once; `finished` waits for the coroutine
+        self._thread_runs[session_id] = finished
+        # Done callbacks run on the worker thread; hand the cleanup to the loop
+        loop = asyncio.get_running_loop()
+        finished.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._thread_run_done, session_id, f)
+        )
+        return future
+    
+    def _thread_run_done(self, session_id: str, future: Future):
+        if self._thread_runs.get(session_id) is future:
+            del self._thread_runs[session_id]
+    
+    @staticmethod
+    def _summarize_result(result: Any) -> Dict[str, Any]:
+        """Extract the response, tool usage and result text from a run (CPU-only)"""
+        # Extract messages and tools used from result (like CLI)
+        summary = _RunSummary()
+        
+        # Process new_items to extract response and tool usage
+        for item in getattr(result, 'new_items', None) or ():
+            handler = _TYPE_HANDLERS.get(getattr(item, 'type', None))
+            if handler is not None:
+                handler(summary, item)
+        
+        initial_message = summary.initial_message
+        final_message = summary.final_message
+        tools_used = summary.tools_used
+        tool_commands = summary.tool_commands
+        tool_outputs = list(summary.tool_outputs)
+        
+        # For task result, prioritize tool outputs over AI messages
+        task_result = ""
+
+        # Use tool outputs as primary task result 
+        if tool_outputs:
+            # Combine all tool outputs
+            task_result = "\n\n".join(tool_outputs)
+        elif tools_used:
+            task_result = f"Executed tools: {', '.join(tools_used)}"
+        else:
+            # Fallback to AI response if no tools were used
+            assistant_message = final_message if final_message else initial_message
+            if assistant_message:
+                task_result = assistant_message
+            else:
+                task_result = "Task completed"
+        
+        return {
+            "initial_message": initial_message,
+            "final_message": final_message,
+            "tools_used": tools_used,
+            "tool_commands": tool_commands,
+            "tool_outputs": tool_outputs,
+            "task_result": task_result
+        }
+    
     async def _notify_task_update(self, task: Task):
         """Notify WebSocket clients of task update"""
+        # Built lazily: to_dict() only runs if a UI is open for the session
         await websocket_manager.broadcast_to_session(
             task.session_id,
-            {
+            lambda: {
                 "type": "task_update",
                 "task": task.to_dict()
             }
@@ -234,6 +507,8 @@ class TaskManager:
     
     async def _notify_task_log(self, task: Task, log_entry: Dict[str, Any]):
         """Notify WebSocket clients of new log entry"""
+        if not websocket_manager.has_subscribers(task.session_id):
+            return
         await websocket_manager.broadcast_to_session(
             task.session_id,
             {
@@ -249,47 +524,74 @@ class TaskManager:
     
     async def wait_for_task(self, task_id: str, timeout: float = 60.0) -> bool:
         """Wait for a task to complete"""
-        if task_id not in self.running_tasks:
+        task = self.tasks.get(task_id)
+        if task is None or task._done is None or task._done.done():
             return True  # Task already completed or doesn't exist
         
         try:
-            await asyncio.wait_for(self.running_tasks[task_id], timeout=timeout)
+            # Shield so a timeout doesn't cancel the shared completion future
+            await asyncio.wait_for(asyncio.shield(task._done), timeout=timeout)
             return True
         except asyncio.TimeoutError:
-            # Cancel the task if it times out
-            if task_id in self.running_tasks:
-                self.running_tasks[task_id].cancel()
+            # Cancel the task if it times out; _execute_task reports the
+            # cancellation as this timeout
+            task._timeout_error = f"Task timed out after {timeout} seconds"
+            running = self.running_tasks.get(task_id)
+            if running is not None:
+                running.cancel()
+                # Let the cancellation finish so the final status is settled
+                await asyncio.wait({running})
             
-            # Update task status
-            if task_id in self.tasks:
-                task = self.tasks[task_id]
+            if task.status not in _FINISHED_STATUSES:
+                # Cancelled before it ever started running
                 task.status = TaskStatus.FAILED
-                task.error = f"Task timed out after {timeout} seconds"
+                task.error = task._timeout_error
                 task.completed_at = datetime.utcnow()
+                await self._notify_task_update(task)
             
-            return False
+            # It may still have finished in the meantime
+            return task.status == TaskStatus.COMPLETED
         except Exception as e:
             return False
     
     def get_session_tasks(self, session_id: str) -> List[Task]:
-        """Get all tasks for a session"""
-        return [
+        """Get all tasks for a session, oldest first"""
+        tasks = [
             task for task in self.tasks.values()
             if task.session_id == session_id
         ]
+        # Store order is recency of use, not creation
+        tasks.sort(key=lambda task: task.created_ts)
+        return tasks
     
     async def cancel_task(self, task_id: str) -> bool:
         """Cancel a running task"""
-        async with self._lock:
-            if task_id in self.running_tasks:
-                self.running_tasks[task_id].cancel()
-                return True
-            return False
+        if task_id in self.running_tasks:
+            self.running_tasks[task_id].cancel()
+            return True
+        return False
     
     def start_background_tasks(self):
         """Start background tasks for cleanup, etc."""
-        # Add any background tasks here (e.g., cleanup old tasks)
-        pass
+        self._background_tasks.append(asyncio.create_task(self._reap_loop()))
+    
+    async def _reap_loop(self):
+        """Periodically drop finished tasks older than the TTL"""
+        while True:
+            await asyncio.sleep(_REAP_INTERVAL)
+            self.reap_finished_tasks()
+    
+    def reap_finished_tasks(self) -> int:
+        """Remove finished tasks completed more than TASK_TTL_MINUTES ago"""
+        cutoff = datetime.utcnow() - timedelta(minutes=TASK_TTL_MINUTES)
+        expired = [
+            task_id for task_id, task in self.tasks.items()
+            if task.status in _FINISHED_STATUSES
+            and task.completed_at is not None and task.completed_at < cutoff
+        ]
+        for task_id in expired:
+            del self.tasks[task_id]
+        return len(expired)
     
     async def cleanup(self):
         """Clean up all running tasks"""
@@ -297,19 +599,16 @@ class TaskManager:
         for task in self.running_tasks.values():
             task.cancel()
         
-        # Wait for all tasks to complete
+        # Wait for all tasks to complete; results are discarded, so no gather
         if self.running_tasks:
-            await asyncio.gather(
-                *self.running_tasks.values(),
-                return_exceptions=True
-            )
+            await asyncio.wait(set(self.running_tasks.values()))
         
         # Cancel background tasks
         for task in self._background_tasks:
             task.cancel()
         
         if self._background_tasks:
-            await asyncio.gather(
-                *self._background_tasks,
-                return_exceptions=True
-            )
+            await asyncio.wait(set(self._background_tasks))
+        
+        self._executor.shutdown(wait=False)
+        _stop_worker_loops()
@@ -2,10 +2,30 @@
 WebSocket Manager for CAI Web Backend
 """
 import asyncio
-from typing import Dict, List, Set, Any
+import os
+from typing import Dict, List, Optional, Set, Any, Tuple, Callable, Union
 from fastapi import WebSocket
 import json
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(data: Any) -> str:
+        """Serialize data to a JSON string"""
+        return orjson.dumps(data).decode()
+    
+    loads = orjson.loads
+else:
+    dumps = json.dumps
+    loads = json.loads
+
+# Most WebSocket sends in flight at once across all broadcasts (at least one)
+WS_SEND_CONCURRENCY = max(1, int(os.getenv("CAI_WS_SEND_CONCURRENCY", "128")))
+
 
 class WebSocketManager:
     """Manages WebSocket connections for real-time updates"""
@@ -13,13 +33,27 @@ class WebSocketManager:
     def __init__(self):
         # Maps session_id to list of WebSocket connections
         self.connections: Dict[str, List[WebSocket]] = {}
-        self._lock = asyncio.Lock()
+        # Created on first use so they bind to the server's running loop (3.9);
+        # the global manager below is built at import time
+        self._lock: Optional[asyncio.Lock] = None
+        # Backpressure: bounds concurrent sends (and their buffers) under large fan-outs
+        self._send_sem: Optional[asyncio.Semaphore] = None
+    
+    def _connections_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+    
+    def _send_semaphore(self) -> asyncio.Semaphore:
+        if self._send_sem is None:
+            self._send_sem = asyncio.Semaphore(WS_SEND_CONCURRENCY)
+        return self._send_sem
     
     async def connect(self, websocket: WebSocket, session_id: str):
         """Accept and register a WebSocket connection"""
         await websocket.accept()
         
-        async with self._lock:
+        async with self._connections_lock():
             if session_id not in self.connections:
                 self.connections[session_id] = []
             self.connections[session_id].append(websocket)
@@ -32,44 +66,98 @@ class WebSocketManager:
     
     def disconnect(self, websocket: WebSocket, session_id: str):
         """Remove a WebSocket connection"""
-        if session_id in self.connections:
-            self.connections[session_id].remove(websocket)
-            if not self.connections[session_id]:
+        websockets = self.connections.get(session_id)
+        if websockets and websocket in websockets:
+            websockets.remove(websocket)
+            if not websockets:
                 del self.connections[session_id]
     
-    async def _send_to_websocket(self, websocket: WebSocket, data: Dict[str, Any]):
+    async def _send_to_websocket(self, websocket: WebSocket, data: Dict[str, Any]) -> bool:
         """Send data to a single WebSocket connection"""
+        return await self._send_text_to_websocket(websocket, dumps(data))
+    
+    async def _send_text_to_websocket(self, websocket: WebSocket, text: str) -> bool:
+        """Send pre-serialized JSON text to a single WebSocket connection
+        
+        Returns False if the send failed (the connection is most likely closed).
+        """
         try:
-            await websocket.send_json(data)
+            async with self._send_semaphore():
+                # Text frames: the frontend parses event.data as a JSON string
+                await websocket.send_text(text)
+            return True
         except Exception:
             # Connection might be closed
-            pass
+            return False
+    
+    async def _fan_out(self, targets: List[Tuple[str, WebSocket]], text: str):
+        """Send text to a snapshot of connections and prune the ones that failed"""
+        if not targets:
+            return
+        results = await asyncio.gather(
+            *(self._send_text_to_websocket(ws, text) for _, ws in targets),
+            return_exceptions=True
+        )
+        dead = [target for target, ok in zip(targets, results) if ok is not True]
+        if dead:
+            async with self._connections_lock():
+                for session_id, ws in dead:
+                    self.disconnect(ws, session_id)
     
-    async def broadcast_to_session(self, session_id: str, data: Dict[str, Any]):
-        """Broadcast data to all connections for a session"""
-        if session_id in self.connections:
-            # Create tasks for all sends
-            tasks = [
-                self._send_to_websocket(ws, data)
-                for ws in self.connections[session_id]
-            ]
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
+    def has_subscribers(self, session_id: str) -> bool:
+        """Whether any connection is listening to the session"""
+        return bool(self.connections.get(session_id))
+    
+    async def broadcast_to_session(
+        self,
+        session_id: str,
+        data: Union[Dict[str, Any], Callable[[], Dict[str, Any]]]
+    ):
+        """Broadcast data to all connections for a session
+        
+        `data` may be a zero-argument builder; it is only called when the
+        session has at least one connection.
+        """
+        websockets = self.connections.get(session_id)
+        if not websockets:
+            return
+        if callable(data):
+            data = data()
+        # Serialize once, share the text across connections
+        await self._fan_out([(session_id, ws) for ws in websockets], dumps(data))
+    
+    async def broadcast_batch(self, session_id: str, events: List[Dict[str, Any]]):
+        """Broadcast several events to a session as a single batch frame
+        
+        The frame is serialized once and shared by every connection.
+        """
+        if not events:
+            return
+        if len(events) == 1:
+            await self.broadcast_to_session(session_id, events[0])
+            return
+        websockets = self.connections.get(session_id)
+        if websockets:
+            await self._fan_out(
+                [(session_id, ws) for ws in websockets],
+                dumps({"type": "batch", "events": events})
+            )
     
     async def broadcast_to_all(self, data: Dict[str, Any]):
         """Broadcast data to all connected clients"""
-        tasks = []
-        for websockets in self.connections.values():
-            for ws in websockets:
-                tasks.append(self._send_to_websocket(ws, data))
-        
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        await self._fan_out(
+            [
+                (session_id, ws)
+                for session_id, websockets in list(self.connections.items())
+                for ws in websockets
+            ],
+            dumps(data)
+        )
     
     async def disconnect_all(self):
         """Disconnect all WebSocket connections"""
-        for session_id, websockets in self.connections.items():
-            for ws in websockets:
+        for session_id, websockets in list(self.connections.items()):
+            for ws in list(websockets):
                 try:
                     await ws.close()
                 except Exception:
@@ -1,53 +1,93 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useApi } from '../contexts/ApiContext';
 import { useWebSocket } from '../contexts/WebSocketContext';
 import './SessionChat.css';
 
+// Give up waiting for a reply a little after the backend's own 2 minute timeout
+const REPLY_TIMEOUT_MS = 130000;
+
+// The last message being a (non-thinking) assistant reply means no turn is pending
+const turnFinished = (messages) => {
+  const last = messages[messages.length - 1];
+  return Boolean(last && last.role === 'assistant' && !last.is_thinking);
+};
+
 function SessionChat({ session }) {
   const api = useApi();
-  const { addListener } = useWebSocket();
+  const { addListener, isConnected } = useWebSocket();
   const [message, setMessage] = useState('');
   const [sending, setSending] = useState(false);
   const [messages, setMessages] = useState([]);
+  const replyTimeoutRef = useRef(null);
+  const wasConnectedRef = useRef(isConnected);
+
+  const finishTurn = () => {
+    clearTimeout(replyTimeoutRef.current);
+    setSending(false);
+  };
+
+  // Replies may arrive both over the socket and over HTTP; keep one copy
+  const addMessage = (msg) => {
+    setMessages(prev => (prev.some(m => m.id === msg.id) ? prev : [...prev, msg]));
+  };
+
+  const loadMessages = async (isCurrent = () => true) => {
+    try {
+      const response = await api.getSessionMessages(session.id);
+      if (isCurrent()) {
+        setMessages(response.messages);
+        if (turnFinished(response.messages)) {
+          finishTurn();
+        }
+      }
+    } catch (error) {
+      if (isCurrent()) {
+        console.error('Error loading messages:', error);
+      }
+    }
+  };
 
   useEffect(() => {
     let mounted = true;
     
     // Load existing messages when session changes
-    const loadMessages = async () => {
-      try {
-        const response = await api.getSessionMessages(session.id);
-        if (mounted) {
-          setMessages(response.messages);
-        }
-      } catch (error) {
-        if (mounted) {
-          console.error('Error loading messages:', error);
-        }
-      }
-    };
-    
-    loadMessages();
+    loadMessages(() => mounted);
 
     // Listen for new messages
     const removeMessageListener = addListener('message_added', (data) => {
       if (mounted) {
-        setMessages(prev => [...prev, data.message]);
+        addMessage(data.message);
+        // The final (non-thinking) assistant reply ends the turn
+        if (data.message.role === 'assistant' && !data.message.is_thinking) {
+          finishTurn();
+        }
       }
     });
 
     return () => {
       mounted = false;
       removeMessageListener();
+      clearTimeout(replyTimeoutRef.current);
     };
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [session.id]); // Remove api and addListener dependencies
 
+  useEffect(() => {
+    // Events sent while the socket was down are lost; catch up from the server
+    if (isConnected && !wasConnectedRef.current) {
+      loadMessages();
+    }
+    wasConnectedRef.current = isConnected;
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [isConnected]);
+
   const sendMessage = async (e) => {
     e.preventDefault();
     if (!message.trim() || sending) return;
 
     setSending(true);
+    clearTimeout(replyTimeoutRef.current);
+    replyTimeoutRef.current = setTimeout(() => setSending(false), REPLY_TIMEOUT_MS);
     
     // Add user message immediately to UI
     const userMsg = {
@@ -61,21 +101,22 @@ function SessionChat({ session }) {
     setMessages(prev => [...prev, userMsg]);
     
     try {
-      const response = await api.sendMessage(session.id, message);
-      // Update the user message and add assistant response
-      setMessages(prev => [
-        ...prev.slice(0, -1), // Remove temporary user message
-        userMsg, // Add proper user message
-        response.message // Add assistant response
-      ]);
+      if (isConnected) {
+        // Returns once the task is queued; the reply arrives via 'message_added'
+        await api.sendMessage(session.id, message);
+      } else {
+        // No socket to deliver the reply: wait for it in the response instead
+        const response = await api.sendMessage(session.id, message, { wait: true });
+        addMessage(response.message);
+        finishTurn();
+      }
       setMessage('');
     } catch (error) {
       console.error('Error sending message:', error);
       alert('Failed to send message: ' + error.message);
       // Remove the temporary user message on error
-      setMessages(prev => prev.slice(0, -1));
-    } finally {
-      setSending(false);
+      setMessages(prev => prev.filter(m => m.id !== userMsg.id));
+      finishTurn();
     }
   };
 
@@ -47,10 +47,11 @@ export const ApiProvider = ({ children }) => {
     }),
 
     // Message/Task endpoints
-    sendMessage: (sessionId, message) => apiCall(`/sessions/${sessionId}/messages`, {
-      method: 'POST',
-      body: JSON.stringify({ content: message }),
-    }),
+    sendMessage: (sessionId, message, { wait = false } = {}) => apiCall(
+      `/sessions/${sessionId}/messages${wait ? '?wait=true' : ''}`, {
+        method: 'POST',
+        body: JSON.stringify({ content: message }),
+      }),
 
     getSessionMessages: (sessionId) => apiCall(`/sessions/${sessionId}/messages`),
 
@@ -66,16 +66,21 @@ export const WebSocketProvider = ({ children }) => {
 
     ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
-        setLastMessage(data);
+        const frame = JSON.parse(event.data);
+        // Batched frames carry several events; dispatch them in order
+        const events = frame.type === 'batch' ? frame.events : [frame];
         
-        // Notify specific listeners based on message type
-        if (data.type) {
-          notifyListeners(data.type, data);
-        }
-        
-        // Notify general message listeners
-        notifyListeners('message', data);
+        events.forEach((data) => {
+          setLastMessage(data);
+          
+          // Notify specific listeners based on message type
+          if (data.type) {
+            notifyListeners(data.type, data);
+          }
+          
+          // Notify general message listeners
+          notifyListeners('message', data);
+        });
       } catch (error) {
         console.error('Error parsing WebSocket message:', error);
       }
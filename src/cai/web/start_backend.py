@@ -28,10 +28,26 @@ if __name__ == "__main__":
     print("🌐 Backend will be available at: http://localhost:8000")
     print("📋 API docs at: http://localhost:8000/docs")
     
+    # libuv-backed loop / C HTTP parser when available (uvicorn[standard]);
+    # not on Windows, where uvloop doesn't exist
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    
     uvicorn.run(
         "cai.web.backend.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        # The reloader forks a watcher and restarts on edits; development only
+        reload=os.getenv("CAI_DEV") == "1",
+        loop=loop,
+        http=http,
         log_level="info"
     )
@@ -0,0 +1,243 @@
+import asyncio
+import gc
+
+import pytest
+
+pytest.importorskip("discord")
+
+from cai import discord_bot  # noqa: E402
+
+
+class _FakeModel:
+    def __init__(self):
+        self.model = "test-model"
+        self._client = object()
+        self.message_history = []
+
+
+class _FakeAgent:
+    def __init__(self):
+        self.name = "Fake"
+        self.model = _FakeModel()
+        self.handoffs = []
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(discord_bot, "get_agent_by_name", lambda *args, **kwargs: _FakeAgent())
+    return discord_bot.AgentSession(1, "fake_agent", "test-model")
+
+
+def _full_rebuild(messages, user_text):
+    history = discord_bot.AgentSession._reshape_history(messages)
+    return discord_bot.AgentSession._fix_history(history) + [{"role": "user", "content": user_text}]
+
+
+def _tool_call(call_id):
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{
+            "id": call_id,
+            "type": "function",
+            "function": {"name": "tool", "arguments": "{}"},
+        }],
+    }
+
+
+def _tool_result(call_id):
+    return {"role": "tool", "tool_call_id": call_id, "content": "ok"}
+
+
+def test_history_context_without_history_is_plain_text(session):
+    assert session.build_history_context("hi") == "hi"
+
+
+def test_incremental_history_matches_full_rebuild(session):
+    mh = session.agent.model.message_history
+    turns = [
+        [{"role": "user", "content": "one"}, {"role": "assistant", "content": "reply one"}],
+        [{"role": "user", "content": "two"}, _tool_call("call_1")],
+        # The result of call_1 arrives in the next turn, across the cursor
+        [_tool_result("call_1"), {"role": "assistant", "content": "reply two"}],
+        [{"role": "user", "content": "three"}, _tool_call("call_2"), _tool_result("call_2")],
+    ]
+    for i, new_messages in enumerate(turns):
+        mh.extend(new_messages)
+        assert session.build_history_context(f"next {i}") == _full_rebuild(mh, f"next {i}")
+        assert session._mh_cursor == len(mh)
+
+
+def test_history_context_does_not_leak_user_text(session):
+    mh = session.agent.model.message_history
+    mh.append({"role": "user", "content": "one"})
+    session.build_history_context("first")
+    context = session.build_history_context("second")
+
+    assert [m["content"] for m in context if m["role"] == "user"] == ["one", "second"]
+
+
+def test_replaced_or_truncated_history_restarts(session):
+    model = session.agent.model
+    model.message_history.extend([
+        {"role": "user", "content": "old"},
+        {"role": "assistant", "content": "old reply"},
+    ])
+    session.build_history_context("x")
+
+    model.message_history = [{"role": "user", "content": "new"}]
+    assert session.build_history_context("y") == _full_rebuild(model.message_history, "y")
+
+    model.message_history.clear()
+    model.message_history.append({"role": "user", "content": "after clear"})
+    assert session.build_history_context("z") == _full_rebuild(model.message_history, "z")
+
+
+def test_reset_forgets_incremental_state(session):
+    mh = session.agent.model.message_history
+    mh.append({"role": "user", "content": "one"})
+    session.build_history_context("x")
+    session.reset()
+
+    assert mh == []
+    assert session._fixed_history == []
+    assert session._mh_cursor == 0
+    assert session.build_history_context("y") == "y"
+
+
+class _FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def edit(self, content):
+        self.edits.append(content)
+
+
+async def test_edit_coalescer_sends_only_latest_text():
+    msg = _FakeMessage()
+    coalescer = discord_bot.EditCoalescer(msg, interval=0.05)
+    coalescer.start()
+    for text in ("a", "ab", "abc"):
+        coalescer.set_latest(text)
+    await asyncio.sleep(0.15)
+
+    assert msg.edits == ["abc"]
+
+    coalescer.set_latest("abcd")
+    await asyncio.sleep(0.15)
+    await coalescer.stop()
+
+    assert msg.edits == ["abc", "abcd"]
+
+
+async def test_edit_coalescer_stop_drops_pending_edit():
+    msg = _FakeMessage()
+    coalescer = discord_bot.EditCoalescer(msg, interval=0.05)
+    coalescer.start()
+    coalescer.set_latest("partial")
+    await coalescer.stop()
+    # The caller's final edit is the last one the message sees
+    await msg.edit(content="final")
+    await asyncio.sleep(0.1)
+
+    assert msg.edits == ["final"]
+
+
+async def test_channel_lock_is_shared_and_released_when_unused(session):
+    lock = session.lock
+    assert session.lock is lock
+    async with lock:
+        assert session.lock.locked()
+    del lock
+    gc.collect()
+
+    assert 1 not in discord_bot._CHANNEL_LOCKS
+
+
+def test_store_session_evicts_least_recently_used(session, monkeypatch):
+    monkeypatch.setattr(discord_bot, "SESSIONS", discord_bot.OrderedDict())
+    monkeypatch.setattr(discord_bot, "MAX_SESSIONS", 2)
+    sessions = {
+        channel_id: discord_bot.AgentSession(channel_id, "fake_agent", "test-model")
+        for channel_id in (10, 11, 12)
+    }
+    for channel_id in (10, 11):
+        discord_bot.store_session(channel_id, sessions[channel_id])
+    sessions[10].agent.model.message_history.append({"role": "user", "content": "x"})
+    discord_bot.store_session(12, sessions[12])
+
+    assert list(discord_bot.SESSIONS) == [11, 12]
+    # The evicted session was reset
+    assert sessions[10].agent.model.message_history == []
+
+
+class _FlakyMessage(_FakeMessage):
+    """Fails every streamed edit; only the final edit goes through"""
+
+    async def edit(self, content):
+        if content != "final":
+            raise RuntimeError("connection reset")
+        await super().edit(content)
+
+
+async def test_edit_coalescer_survives_failing_edits():
+    msg = _FlakyMessage()
+    coalescer = discord_bot.EditCoalescer(msg, interval=0.02)
+    coalescer.start()
+    coalescer.set_latest("one")
+    await asyncio.sleep(0.06)
+    # The worker is still alive after the failure
+    assert not coalescer._task.done()
+    coalescer.set_latest("two")
+    await asyncio.sleep(0.06)
+
+    await coalescer.stop()
+    await msg.edit(content="final")
+
+    assert msg.edits == ["final"]
+
+
+async def test_edit_coalescer_stop_swallows_worker_errors():
+    msg = _FakeMessage()
+    coalescer = discord_bot.EditCoalescer(msg, interval=0.02)
+
+    async def crashed():
+        raise RuntimeError("boom")
+
+    coalescer._task = asyncio.ensure_future(crashed())
+    await asyncio.sleep(0)
+    await coalescer.stop()
+    await msg.edit(content="final")
+
+    assert msg.edits == ["final"]
+
+
+def test_command_version_tracks_option_changes(monkeypatch):
+    monkeypatch.setenv("ALLOWED_GUILD_ID", "0")
+    bot = discord_bot.CAIBot()
+    before = bot._command_version()
+
+    @bot.tree.command(name="extra", description="extra")
+    @discord_bot.app_commands.describe(value="value")
+    async def extra(interaction, value: int):
+        pass
+
+    with_int = bot._command_version()
+    bot.tree.remove_command("extra")
+
+    @bot.tree.command(name="extra", description="extra")
+    @discord_bot.app_commands.describe(value="value")
+    async def extra_str(interaction, value: str):
+        pass
+
+    # Same name/description/parameter names, different option type
+    assert len({before, with_int, bot._command_version()}) == 3
+
+
+def test_save_bot_state_replaces_file_atomically(tmp_path, monkeypatch):
+    state_file = tmp_path / "state.json"
+    monkeypatch.setattr(discord_bot, "BOT_STATE_FILE", state_file)
+    discord_bot._save_bot_state({"guild_command_versions": {"1": "abc"}})
+
+    assert discord_bot._load_bot_state() == {"guild_command_versions": {"1": "abc"}}
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
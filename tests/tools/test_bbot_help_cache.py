@@ -0,0 +1,127 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from cai.tools.reconnaissance import bbot
+
+HELP = "usage: bbot [-h] [-t TARGET ...]"
+
+
+class _FakeCommands:
+    """Stands in for run_command_async; help runs take `delay` seconds"""
+
+    def __init__(self):
+        self.calls = []
+        self.delay = 0.0
+        self.help_output = HELP
+
+    async def __call__(self, command, timeout=None, stream=False, tool_name=None, **kwargs):
+        self.calls.append(command)
+        if command == "bbot --help":
+            await asyncio.sleep(self.delay)
+            return self.help_output
+        return "scan output"
+
+    @property
+    def help_calls(self):
+        return self.calls.count("bbot --help")
+
+
+@pytest.fixture
+def commands(monkeypatch, tmp_path):
+    for var in ("CAI_ACTIVE_CONTAINER", "SSH_USER", "SSH_HOST"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setattr(bbot, "_bbot_help_cache", {"ts": 0.0, "text": "", "key": "", "hash": ""})
+    monkeypatch.setattr(bbot, "_bbot_help_lock", None)
+    monkeypatch.setattr(bbot, "_bbot_help_refreshes", {})
+    monkeypatch.setattr(bbot, "_HELP_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(bbot, "_bbot_help_disk_loaded", set())
+    monkeypatch.setattr(bbot, "_bbot_preamble_cache", {"hash": "", "text": ""})
+    monkeypatch.setattr(bbot, "_bbot_run_sem", None)
+    fake = _FakeCommands()
+    monkeypatch.setattr(bbot, "run_command_async", fake)
+    return fake
+
+
+async def test_concurrent_misses_fetch_help_once(commands):
+    commands.delay = 0.05
+    results = await asyncio.gather(*(bbot._get_bbot_help_text() for _ in range(10)))
+
+    assert results == [HELP] * 10
+    assert commands.help_calls == 1
+
+
+async def test_stale_hit_returns_at_once_and_refreshes_once(commands):
+    key = f"help::{bbot._execution_target()}"
+    bbot._bbot_help_cache.update(
+        ts=time.time() - bbot._HELP_TTL - 1, text="old help", key=key, hash="old"
+    )
+    commands.delay = 0.05
+
+    results = await asyncio.gather(*(bbot._get_bbot_help_text() for _ in range(5)))
+
+    assert results == ["old help"] * 5
+    # Served without waiting on the (still running) refresh
+    (refresh,) = bbot._bbot_help_refreshes.values()
+    assert not refresh.done()
+    await refresh
+    assert commands.help_calls == 1
+    assert await bbot._get_bbot_help_text() == HELP
+
+
+async def test_disk_copy_seeds_a_fresh_process(commands, monkeypatch):
+    await bbot._get_bbot_help_text()
+    # A new process: empty in-memory cache, same cache directory
+    monkeypatch.setattr(bbot, "_bbot_help_cache", {"ts": 0.0, "text": "", "key": "", "hash": ""})
+    monkeypatch.setattr(bbot, "_bbot_help_disk_loaded", set())
+
+    assert await bbot._get_bbot_help_text() == HELP
+    assert commands.help_calls == 1
+
+
+async def test_failed_help_is_not_cached_and_blocks_the_run(commands, tmp_path):
+    commands.help_output = "bash: bbot: command not found"
+
+    with pytest.raises(RuntimeError, match="command not found"):
+        await bbot._get_bbot_help_text()
+    assert list(tmp_path.iterdir()) == []
+
+    output = await bbot._run_bbot(SimpleNamespace(), "-t example.com")
+    assert "Refusing to run `bbot`" in output
+    assert "bbot -t example.com" not in commands.calls
+
+    commands.help_output = HELP
+    assert await bbot._get_bbot_help_text() == HELP
+    assert commands.help_calls == 3
+
+
+async def test_help_is_cached_per_execution_target(commands, monkeypatch):
+    await bbot._get_bbot_help_text()
+    monkeypatch.setenv("CAI_ACTIVE_CONTAINER", "abc123")
+    await bbot._get_bbot_help_text()
+    await bbot._get_bbot_help_text()
+
+    assert commands.help_calls == 2
+
+
+async def test_skip_help_runs_without_fetching_help(commands):
+    output = await bbot._run_bbot(SimpleNamespace(), "-t example.com", skip_help=True)
+
+    assert output == "scan output"
+    assert commands.calls == ["bbot -t example.com"]
+
+
+async def test_full_preamble_is_shown_once_per_context(commands):
+    ctx = SimpleNamespace()
+    first = await bbot._run_bbot(ctx, "-t example.com")
+    second = await bbot._run_bbot(ctx, "-t example.com")
+    other = await bbot._run_bbot(SimpleNamespace(), "-t example.com")
+
+    assert first.startswith("### BBOT --help (for context) ###\n" + HELP)
+    assert second.startswith("### BBOT --help already shown this session")
+    assert HELP not in second
+    # The formatted preamble is reused for the next context
+    assert other == first
+    assert commands.help_calls == 1
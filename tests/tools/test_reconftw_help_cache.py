@@ -0,0 +1,145 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from cai.tools.reconnaissance import reconftw
+
+HELP = "Usage: reconftw.sh -d domain.tld [-r|-s|-p|-a]"
+
+
+class _FakeCommands:
+    """Stands in for run_command_async; help runs take `delay` seconds"""
+
+    def __init__(self):
+        self.calls = []
+        self.delay = 0.0
+        self.help_output = HELP
+
+    async def __call__(self, command, timeout=None, stream=False, tool_name=None, **kwargs):
+        self.calls.append(command)
+        if command.endswith(" -h"):
+            await asyncio.sleep(self.delay)
+            return self.help_output
+        return "scan output"
+
+    @property
+    def help_calls(self):
+        return sum(command.endswith(" -h") for command in self.calls)
+
+
+def _empty_cache():
+    return {"ts": 0.0, "text": "", "key": "", "hash": ""}
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "reconftw.sh"
+    path.write_text("#!/bin/sh\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def commands(monkeypatch, tmp_path):
+    for var in ("CAI_ACTIVE_CONTAINER", "SSH_USER", "SSH_HOST", "RECONFTW_PATH"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setattr(reconftw, "_recon_help_cache", _empty_cache())
+    monkeypatch.setattr(reconftw, "_recon_help_locks", {})
+    monkeypatch.setattr(reconftw, "_recon_help_refreshes", {})
+    monkeypatch.setattr(reconftw, "_HELP_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(reconftw, "_recon_help_disk_loaded", set())
+    monkeypatch.setattr(reconftw, "_recon_preamble_cache", {"hash": "", "text": ""})
+    monkeypatch.setattr(reconftw, "_reconftw_run_sem", None)
+    monkeypatch.setattr(reconftw, "_resolved_script_paths", {})
+    fake = _FakeCommands()
+    monkeypatch.setattr(reconftw, "run_command_async", fake)
+    return fake
+
+
+async def test_concurrent_misses_fetch_help_once(commands, script):
+    commands.delay = 0.05
+    results = await asyncio.gather(*(reconftw._get_reconftw_help_text(script) for _ in range(10)))
+
+    assert results == [HELP] * 10
+    assert commands.help_calls == 1
+
+
+async def test_stale_hit_returns_at_once_and_refreshes_once(commands, script):
+    await reconftw._get_reconftw_help_text(script)
+    reconftw._recon_help_cache["ts"] = time.time() - reconftw._HELP_TTL - 1
+    commands.delay = 0.05
+
+    results = await asyncio.gather(*(reconftw._get_reconftw_help_text(script) for _ in range(5)))
+
+    assert results == [HELP] * 5
+    (refresh,) = reconftw._recon_help_refreshes.values()
+    assert not refresh.done()
+    await refresh
+    assert commands.help_calls == 2
+
+
+async def test_disk_copy_seeds_a_fresh_process(commands, script, monkeypatch):
+    await reconftw._get_reconftw_help_text(script)
+    monkeypatch.setattr(reconftw, "_recon_help_cache", _empty_cache())
+    monkeypatch.setattr(reconftw, "_recon_help_disk_loaded", set())
+
+    assert await reconftw._get_reconftw_help_text(script) == HELP
+    assert commands.help_calls == 1
+
+
+async def test_failed_help_is_not_cached_and_blocks_the_run(commands, script, tmp_path):
+    commands.help_output = "Command exited with code 127"
+
+    with pytest.raises(RuntimeError, match="exited with code"):
+        await reconftw._get_reconftw_help_text(script)
+    assert not (tmp_path / "cache").exists()
+
+    output = await reconftw._run_reconftw(SimpleNamespace(), "-d example.com", script)
+    assert "Refusing to run reconftw" in output
+    assert commands.help_calls == 2
+    assert all(command.endswith(" -h") for command in commands.calls)
+
+
+async def test_help_is_cached_per_execution_target(commands, script, monkeypatch):
+    await reconftw._get_reconftw_help_text(script)
+    monkeypatch.setenv("SSH_USER", "kali")
+    monkeypatch.setenv("SSH_HOST", "10.0.0.5")
+    await reconftw._get_reconftw_help_text(script)
+    await reconftw._get_reconftw_help_text(script)
+
+    assert commands.help_calls == 2
+    assert len(list((reconftw._HELP_CACHE_DIR).iterdir())) == 2
+
+
+async def test_skip_help_runs_without_fetching_help(commands, script):
+    output = await reconftw._run_reconftw(
+        SimpleNamespace(), "-d example.com", script, skip_help=True
+    )
+
+    assert output == "scan output"
+    assert commands.calls == [f"{script} -d example.com"]
+
+
+async def test_full_preamble_is_shown_once_per_context(commands, script):
+    ctx = SimpleNamespace()
+    first = await reconftw._run_reconftw(ctx, "-d example.com", script)
+    second = await reconftw._run_reconftw(ctx, "-d example.com", script)
+
+    assert first.startswith("### reconftw.sh -h (for context) ###\n" + HELP)
+    assert second.startswith("### reconftw.sh -h already shown this session")
+    assert HELP not in second
+    assert commands.help_calls == 1
+
+
+def test_resolved_script_path_is_cached_until_env_changes(commands, script, monkeypatch):
+    monkeypatch.setenv("RECONFTW_PATH", script)
+    assert reconftw._resolve_script_path() == script
+
+    os.remove(script)
+    # Resolved once; no filesystem probe on the next call
+    assert reconftw._resolve_script_path() == script
+    monkeypatch.setenv("RECONFTW_PATH", script + ".missing")
+    assert reconftw._resolve_script_path() == script + ".missing"
@@ -0,0 +1,77 @@
+from cai.web.backend.lru import LRUDict
+
+
+def test_get_moves_entry_to_end():
+    d = LRUDict(3)
+    for key in "abc":
+        d[key] = key.upper()
+
+    assert d.get("a") == "A"
+    assert list(d) == ["b", "c", "a"]
+    assert d["b"] == "B"
+    assert list(d) == ["c", "a", "b"]
+    assert d.get("missing", 0) == 0
+
+
+def test_set_evicts_least_recently_used():
+    evicted = []
+    d = LRUDict(2, on_evict=lambda key, value: evicted.append((key, value)))
+    d["a"] = 1
+    d["b"] = 2
+    d["a"]  # b is now the least recently used
+    d["c"] = 3
+
+    assert list(d) == ["a", "c"]
+    assert evicted == [("b", 2)]
+
+
+def test_non_evictable_entries_are_skipped():
+    evicted = []
+    d = LRUDict(
+        2,
+        evictable=lambda value: value != "busy",
+        on_evict=lambda key, value: evicted.append(key),
+    )
+    d["a"] = "busy"
+    d["b"] = "idle"
+    d["c"] = "idle"
+
+    assert list(d) == ["a", "c"]
+    assert evicted == ["b"]
+
+    # Nothing evictable left: the map grows past capacity
+    d["c"] = "busy"
+    d["d"] = "busy"
+    assert list(d) == ["a", "c", "d"]
+    assert evicted == ["b"]
+
+
+def test_copy_keeps_settings_and_does_not_evict():
+    evicted = []
+    d = LRUDict(
+        1,
+        evictable=lambda value: value != "busy",
+        on_evict=lambda key, value: evicted.append(key),
+    )
+    d["a"] = "busy"
+    d["b"] = "busy"
+
+    copied = d.copy()
+
+    assert isinstance(copied, LRUDict)
+    assert list(copied) == ["a", "b"]
+    assert copied.maxsize == 1
+    assert evicted == []
+
+    copied["c"] = "idle"
+    copied["d"] = "idle"
+    assert evicted == ["c"]
+    assert list(d) == ["a", "b"]
+
+
+def test_newest_entry_is_never_evicted():
+    d = LRUDict(1, evictable=lambda value: value != "busy")
+    d["a"] = "busy"
+    d["b"] = "idle"
+
+    assert list(d) == ["a", "b"]
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+from cai.web.backend import message_store
+from cai.web.backend.models import ChatMessage, MessageHistory
+
+
+def _message(content: str, ts: float) -> ChatMessage:
+    return ChatMessage(role="user", content=content, created_ts=ts)
+
+
+def _at(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+def test_append_spills_oldest_past_tail():
+    history = MessageHistory("test-spill", maxlen=2)
+    for i in range(5):
+        history.append(_message(f"m{i}", 1000.0 + i))
+
+    assert len(history) == 5
+    assert [m.content for m in history._tail] == ["m3", "m4"]
+    assert len(message_store.load("test-spill")) == 3
+    assert [m.content for m in history] == ["m0", "m1", "m2", "m3", "m4"]
+
+
+def test_zero_maxlen_keeps_one_message():
+    history = MessageHistory("test-zero", maxlen=0)
+    history.append(_message("m0", 1000.0))
+    history.append(_message("m1", 1001.0))
+
+    assert [m.content for m in history] == ["m0", "m1"]
+
+
+def test_since_only_returns_newer_messages():
+    history = MessageHistory("test-since", maxlen=2)
+    for i in range(5):
+        history.append(_message(f"m{i}", 1000.0 + i))
+
+    # Entirely within the in-memory tail
+    assert [m.content for m in history.since(_at(1003.0))] == ["m4"]
+    # Reaches into the spill
+    assert [m.content for m in history.since(_at(1001.0))] == ["m2", "m3", "m4"]
+    assert history.since(_at(1004.0)) == []
+
+
+def test_since_keeps_insertion_order_for_equal_timestamps():
+    history = MessageHistory("test-order", maxlen=1)
+    for i in range(4):
+        history.append(_message(f"m{i}", 1000.0))
+
+    assert [m.content for m in history.since()] == ["m0", "m1", "m2", "m3"]
+
+
+def test_close_purges_spill_and_drops_late_appends():
+    history = MessageHistory("test-close", maxlen=1)
+    for i in range(3):
+        history.append(_message(f"m{i}", 1000.0 + i))
+    history.close()
+
+    history.append(_message("late", 2000.0))
+    history.append(_message("later", 2001.0))
+
+    assert len(history) == 0
+    assert list(history) == []
+    assert message_store.load("test-close") == []
+
+
+async def test_since_async_matches_since():
+    history = MessageHistory("test-since-async", maxlen=2)
+    for i in range(5):
+        history.append(_message(f"m{i}", 1000.0 + i))
+
+    for since in (None, _at(1001.0), _at(1003.0), _at(1004.0)):
+        assert await history.since_async(since) == history.since(since)
+    assert [m.content for m in await history.since_async()] == ["m0", "m1", "m2", "m3", "m4"]
@@ -0,0 +1,184 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from cai.web.backend import task_manager as tm
+from cai.web.backend.models import TaskStatus
+
+
+class _FakeResult:
+    new_items = []
+    raw_responses = []
+
+
+class _FakeRunner:
+    """Stands in for Runner; each run sleeps for `delay` seconds"""
+
+    delay = 0.0
+    started = 0
+    running = 0
+    max_running = 0
+
+    @classmethod
+    async def run(cls, starting_agent, input):
+        cls.started += 1
+        cls.running += 1
+        cls.max_running = max(cls.max_running, cls.running)
+        try:
+            await asyncio.sleep(cls.delay)
+        finally:
+            cls.running -= 1
+        return _FakeResult()
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    class Runner(_FakeRunner):
+        pass
+
+    monkeypatch.setattr(tm, "Runner", Runner)
+    monkeypatch.setattr(tm, "RUN_IN_EXECUTOR", False)
+    return Runner
+
+
+@pytest.fixture
+async def manager():
+    manager = tm.TaskManager()
+    yield manager
+    await manager.cleanup()
+
+
+async def test_completed_task(runner, manager):
+    task = await manager.create_task("s", "hi", agent=None)
+
+    assert await manager.wait_for_task(task.id, timeout=1.0)
+    assert task.status == TaskStatus.COMPLETED
+    assert task.result == "Task completed"
+    assert not manager.has_active_tasks("s")
+
+
+async def test_timeout_marks_task_failed(runner, manager):
+    runner.delay = 10.0
+    task = await manager.create_task("s", "hi", agent=None)
+
+    assert not await manager.wait_for_task(task.id, timeout=0.05)
+    # Settled before wait_for_task returns, and not overwritten by the cancellation
+    assert task.status == TaskStatus.FAILED
+    assert task.error == "Task timed out after 0.05 seconds"
+    assert task.completed_at is not None
+    await asyncio.sleep(0)
+    assert task.status == TaskStatus.FAILED
+    assert task.id not in manager.running_tasks
+
+
+async def test_cancel_is_reported_as_cancelled(runner, manager):
+    runner.delay = 10.0
+    task = await manager.create_task("s", "hi", agent=None)
+    await asyncio.sleep(0.01)
+
+    assert await manager.cancel_task(task.id)
+    await manager.wait_for_task(task.id, timeout=1.0)
+
+    assert task.status == TaskStatus.CANCELLED
+
+
+async def test_executor_runs_reuse_the_session_loop(runner, manager, monkeypatch):
+    monkeypatch.setattr(tm, "RUN_IN_EXECUTOR", True)
+    loops = set()
+
+    class LoopRecordingRunner(runner):
+        @classmethod
+        async def run(cls, starting_agent, input):
+            loops.add(asyncio.get_running_loop())
+            return await super().run(starting_agent, input)
+
+    monkeypatch.setattr(tm, "Runner", LoopRecordingRunner)
+    for _ in range(3):
+        task = await manager.create_task("s", "hi", agent=None)
+        assert await manager.wait_for_task(task.id, timeout=1.0)
+        assert task.status == TaskStatus.COMPLETED
+
+    # One long-lived worker loop, never closed between turns
+    assert len(loops) == 1
+    loop = loops.pop()
+    assert loop is not asyncio.get_running_loop()
+    assert loop.is_running() and not loop.is_closed()
+
+
+async def test_cancelled_executor_run_frees_the_session(runner, manager, monkeypatch):
+    monkeypatch.setattr(tm, "RUN_IN_EXECUTOR", True)
+    runner.delay = 10.0
+    future = manager._start_thread_run("s", None, "hi")
+    await asyncio.sleep(0.05)
+    future.cancel()
+    await asyncio.sleep(0.05)
+
+    assert "s" not in manager._thread_runs
+    # Cancelled before its coroutine ever started
+    manager._start_thread_run("s", None, "hi").cancel()
+    await asyncio.sleep(0.05)
+    assert "s" not in manager._thread_runs
+
+
+async def test_per_session_cap_queues_extra_tasks(runner, manager, monkeypatch):
+    monkeypatch.setattr(tm, "MAX_TASKS_PER_SESSION", 2)
+    runner.delay = 0.05
+    tasks = [await manager.create_task("s", "hi", agent=None) for _ in range(5)]
+    await asyncio.sleep(0.01)
+
+    assert [t.status for t in tasks].count(TaskStatus.RUNNING) == 2
+    assert [t.status for t in tasks].count(TaskStatus.PENDING) == 3
+    for task in tasks:
+        assert await manager.wait_for_task(task.id, timeout=1.0)
+    assert runner.max_running == 2
+
+
+async def test_global_cap_spans_sessions(runner, manager, monkeypatch):
+    monkeypatch.setattr(tm, "MAX_CONCURRENT_TASKS", 3)
+    runner.delay = 0.05
+    tasks = [await manager.create_task(f"s{i}", "hi", agent=None) for i in range(6)]
+    for task in tasks:
+        assert await manager.wait_for_task(task.id, timeout=1.0)
+
+    assert runner.started == 6
+    assert runner.max_running == 3
+
+
+async def test_wait_for_unknown_or_finished_task_returns_at_once(runner, manager):
+    assert await manager.wait_for_task("missing", timeout=0.01)
+
+    task = await manager.create_task("s", "hi", agent=None)
+    await manager.wait_for_task(task.id, timeout=1.0)
+    assert await manager.wait_for_task(task.id, timeout=0.0)
+
+
+async def test_timeout_while_queued_marks_task_failed(runner, manager, monkeypatch):
+    monkeypatch.setattr(tm, "MAX_TASKS_PER_SESSION", 1)
+    runner.delay = 10.0
+    await manager.create_task("s", "first", agent=None)
+    queued = await manager.create_task("s", "second", agent=None)
+    await asyncio.sleep(0.01)
+    assert queued.status == TaskStatus.PENDING
+
+    assert not await manager.wait_for_task(queued.id, timeout=0.05)
+    assert queued.status == TaskStatus.FAILED
+    assert queued.started_at is None
+    assert runner.started == 1
+    # The queued task gave up its place; the session still has the first one
+    assert manager.has_active_tasks("s")
+
+
+async def test_reaper_drops_only_expired_finished_tasks(runner, manager):
+    runner.delay = 10.0
+    old = await manager.create_task("s", "old", agent=None)
+    await manager.wait_for_task(old.id, timeout=0.01)
+    recent = await manager.create_task("s", "recent", agent=None)
+    await manager.wait_for_task(recent.id, timeout=0.01)
+    running = await manager.create_task("s", "running", agent=None)
+    old.completed_at -= timedelta(minutes=tm.TASK_TTL_MINUTES + 1)
+
+    assert manager.reap_finished_tasks() == 1
+    assert manager.get_task(old.id) is None
+    assert manager.get_task(recent.id) is recent
+    assert manager.get_task(running.id) is running
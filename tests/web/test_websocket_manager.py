@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+from cai.web.backend import websocket_manager as wm
+
+
+class _FakeWebSocket:
+    def __init__(self, fail=False, delay=0.0):
+        self.sent = []
+        self.fail = fail
+        self.delay = delay
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.fail:
+            raise RuntimeError("connection closed")
+        await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def close(self):
+        self.closed = True
+
+
+async def _connected(manager, session_id, **kwargs):
+    ws = _FakeWebSocket(**kwargs)
+    await manager.connect(ws, session_id)
+    ws.sent.clear()  # drop the "connected" frame
+    return ws
+
+
+async def test_connect_confirms_the_session():
+    manager = wm.WebSocketManager()
+    ws = _FakeWebSocket()
+    await manager.connect(ws, "s")
+
+    assert ws.sent == [{"type": "connected", "session_id": "s"}]
+    assert manager.has_subscribers("s")
+
+
+async def test_broadcast_reaches_only_the_session():
+    manager = wm.WebSocketManager()
+    a1, a2 = await _connected(manager, "a"), await _connected(manager, "a")
+    b = await _connected(manager, "b")
+
+    await manager.broadcast_to_session("a", {"type": "ping"})
+
+    assert a1.sent == a2.sent == [{"type": "ping"}]
+    assert b.sent == []
+
+
+async def test_builder_only_runs_with_subscribers():
+    manager = wm.WebSocketManager()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"type": "update"}
+
+    await manager.broadcast_to_session("nobody", build)
+    assert calls == []
+
+    ws = await _connected(manager, "s")
+    await manager.broadcast_to_session("s", build)
+    assert calls == [1]
+    assert ws.sent == [{"type": "update"}]
+
+
+async def test_failed_sends_are_pruned():
+    manager = wm.WebSocketManager()
+    alive = await _connected(manager, "s")
+    dead = await _connected(manager, "s")
+    dead.fail = True
+    lone = await _connected(manager, "t")
+    lone.fail = True
+
+    await manager.broadcast_to_all({"type": "ping"})
+
+    assert alive.sent == [{"type": "ping"}]
+    assert manager.connections == {"s": [alive]}
+    assert not manager.has_subscribers("t")
+
+
+async def test_batch_is_one_frame_and_single_event_is_unwrapped():
+    manager = wm.WebSocketManager()
+    ws = await _connected(manager, "s")
+
+    await manager.broadcast_batch("s", [])
+    await manager.broadcast_batch("s", [{"type": "one"}])
+    await manager.broadcast_batch("s", [{"type": "a"}, {"type": "b"}])
+
+    assert ws.sent == [
+        {"type": "one"},
+        {"type": "batch", "events": [{"type": "a"}, {"type": "b"}]},
+    ]
+
+
+async def test_fan_out_bounds_sends_in_flight(monkeypatch):
+    monkeypatch.setattr(wm, "WS_SEND_CONCURRENCY", 2)
+    manager = wm.WebSocketManager()
+    in_flight = 0
+    peak = 0
+
+    class _SlowWebSocket(_FakeWebSocket):
+        async def send_text(self, text):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                await asyncio.sleep(0.01)
+            finally:
+                in_flight -= 1
+
+    for _ in range(6):
+        await manager.connect(_SlowWebSocket(), "s")
+    peak = 0
+
+    await manager.broadcast_to_session("s", {"type": "ping"})
+
+    assert peak == 2
+    assert len(manager.connections["s"]) == 6